@@ -1,24 +1,19 @@
 from fastapi import Body, HTTPException
 from core.support_agent import search_similar_case
-from core.qdrant_service import load_all_cases, get_case_count
+from core.deadline import Deadline
+from core.qdrant_service import aget_case_count
 
 # API wrapper: handle incoming support queries and dispatch to core agent
-async def handle_support_request(query: str) -> dict:
+async def handle_support_request(query: str, deadline: Deadline = None) -> dict:
     query = query.strip()
     if not query:
         raise HTTPException(400, "Empty query")
 
-    cases = load_all_cases()
-
     # Note: Even if database is empty, we might want to generate documents, 
-    # so we proceed instead of returning early if cases is empty
-
-    if not cases and get_case_count() == 0:
-        # Try to proceed anyway as we might generate documents
-        pass
+    # so we proceed instead of returning early if there are no cases
 
     try:
-        result = search_similar_case(query)
+        result = await search_similar_case(query, deadline)
         
         response = {
             "message": result.get("response") or result.get("message", "Brak odpowiedzi"),
@@ -28,6 +23,10 @@ async def handle_support_request(query: str) -> dict:
             "source": "core_support_agent"
         }
         
+        # Degraded answer (request deadline / LLM failure) - tell the client why
+        if result.get("degraded"):
+            response["degraded"] = result.get("degraded")
+        
         # Pass generated file info if present
         if result.get("generated_file"):
             response["generated_file"] = result.get("generated_file")
@@ -35,8 +34,13 @@ async def handle_support_request(query: str) -> dict:
         return response
 
     except Exception as e:
+        # Case count only for the error report - not fetched on the normal path
+        try:
+            cases_count = await aget_case_count()
+        except Exception:
+            cases_count = None
         return {
             "message": "Wystąpił błąd podczas generowania odpowiedzi.",
             "error": str(e),
-            "cases_count": len(cases) if cases else 0
+            "cases_count": cases_count
         }
\ No newline at end of file
@@ -1,19 +1,23 @@
 #import libraries
 from fastapi import FastAPI, Body, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles  # ADDED
 import os
+import json
+import asyncio
+from typing import Optional
 
 # Import components
 from web.forms import form_app
 from web.run_interface import run_app
-from core.qdrant_service import get_case_count, list_cases_summary, get_database_info
-from core.config import KNOWLEDGE_BASE_COLLECTION, SPECIAL_CASES_COLLECTION, BASE_DATA_PATH 
+from core.qdrant_service import aget_case_count, alist_cases_page, aiter_cases, aget_database_info, aget_stats
+from core.config import KNOWLEDGE_BASE_COLLECTION, SPECIAL_CASES_COLLECTION, BASE_DATA_PATH, STORAGE_PATH
 from api.api import handle_support_request
 from core.document_ingestor import document_ingestor
-from core.config import KNOWLEDGE_BASE_PATH, SPECIAL_CASES_PATH
+from core.config import KNOWLEDGE_BASE_PATH, SPECIAL_CASES_PATH, CASES_PAGE_LIMIT, CASES_PAGE_MAX, REQUEST_DEADLINE_HEADER
+from core.deadline import Deadline
 
 # Main application setup
 app = FastAPI(
@@ -45,6 +49,8 @@ app.add_middleware(
 if os.path.exists(BASE_DATA_PATH):
     app.mount("/data", StaticFiles(directory=BASE_DATA_PATH), name="data")
     print(f"Mounted /data to {BASE_DATA_PATH}")
+    if os.path.commonpath([os.path.abspath(STORAGE_PATH), os.path.abspath(BASE_DATA_PATH)]) == os.path.abspath(BASE_DATA_PATH):
+        print(f"WARNING: STORAGE_PATH {STORAGE_PATH} is inside BASE_DATA_PATH - the SQLite stores are downloadable under /data")
 
 # Mount sub-applications
 app.mount("/form", form_app)
@@ -61,7 +67,7 @@ async def read_root(request: Request):
         {
             "request": request,
             "json_folder_path": f"qdrant://{SPECIAL_CASES_COLLECTION}",
-            "case_count": get_case_count()
+            "case_count": await aget_case_count()
         }
     )
 
@@ -72,21 +78,21 @@ async def health_check():
     import datetime
     from core.llm_service import llm_service
     
-    # Test database
+    # Test database (cached collection stats view, refreshed on TTL / ingestion)
     db_ok = False
+    case_count = 0
     try:
-        db_info = get_database_info()
-        case_count = get_case_count()
-        # Check Qdrant 
-        db_ok = db_info.get("storage") == "qdrant" and case_count >= 0
+        stats = await aget_stats()
+        case_count = stats["collections"]["special_cases"]["count"]
+        db_ok = stats["qdrant_ok"]
     except:
         db_ok = False
     
-    # Test LLM
+    # Test LLM (blocking HTTP call runs in a worker thread)
     llm_ok = False
     try:
         import requests
-        response = requests.get(f"{llm_service.llm.base_url}/api/tags", timeout=3)
+        response = await asyncio.to_thread(requests.get, f"{llm_service.base_url}/api/tags", timeout=3)
         llm_ok = response.ok
     except:
         llm_ok = False
@@ -105,14 +111,15 @@ async def health_check():
         "checks": {
             "database": {
                 "healthy": db_ok,
-                "cases": get_case_count() if db_ok else 0,
+                "cases": case_count if db_ok else 0,
                 "path": f"qdrant://{SPECIAL_CASES_COLLECTION}" if db_ok else "unknown",  # CHANGED
-                "storage": db_info.get("storage", "unknown") if db_ok else "unknown"
+                "storage": "qdrant" if db_ok else "unknown",
+                "index_generation": stats["index_generation"] if db_ok else None
             },
             "llm_service": {
                 "healthy": llm_ok,
                 "model": llm_service.model_name if llm_ok else "unknown",
-                "base_url": llm_service.llm.base_url if llm_ok else "unknown"
+                "base_url": llm_service.base_url if llm_ok else "unknown"
             }
         },
         "applications": [
@@ -120,59 +127,120 @@ async def health_check():
             {"name": "run_page", "mounted": True, "path": "/run_page"}
         ]
     }
+@app.get("/ready")
+# Readiness probe: 200 once models are warm and the initial index check is done, 503 before
+async def readiness_check():
+    """Warm-up state (steps, per-model load time and keep-alive status)"""
+    from core.warmup import warmup
+    info = warmup.get_info()
+    return JSONResponse(info, status_code=200 if info["ready"] else 503)
+
 #main agent endpoint
 @app.post("/support")
 # Handle support search requests and return similar cases/results
-async def support(query: str = Body(..., embed=True)):
-    """Search for similar cases in knowledge base - uses API service"""
-    return await handle_support_request(query)
+async def support(request: Request, query: str = Body(..., embed=True)):
+    """Search for similar cases in knowledge base - uses API service (deadline from REQUEST_DEADLINE_HEADER, ms)"""
+    return await handle_support_request(query, Deadline.from_header(request.headers.get(REQUEST_DEADLINE_HEADER)))
 
 
 #all cases endpoint
 @app.get("/cases")
-# Return a summary list of cases from the database
-async def list_cases():
-    """List all cases in database - uses qdrant helpers"""
-    cases = list_cases_summary()
+# Return one page of case summaries (pass next_cursor back as ?cursor= for the next page)
+async def list_cases(limit: int = CASES_PAGE_LIMIT, cursor: Optional[str] = None):
+    """List cases in database page by page - uses qdrant helpers"""
+    limit = max(1, min(limit, CASES_PAGE_MAX))
+    # Qdrant point ids are UUIDs or unsigned integers
+    offset = int(cursor) if cursor and cursor.isdigit() else cursor
+    try:
+        page, total = await asyncio.gather(alist_cases_page(limit, offset), aget_case_count())
+    except Exception as e:
+        # A failed scroll must not look like the last page (next_cursor None)
+        print(f"Error listing cases: {e}")
+        return JSONResponse({"error": f"Could not read cases: {e}", "cursor": cursor}, status_code=503)
     return {
-        "cases": cases,
-        "count": len(cases),
+        "cases": page["cases"],
+        "count": len(page["cases"]),
+        "total": total,
+        "next_cursor": page["next_cursor"],
         "database_path": f"qdrant://{SPECIAL_CASES_COLLECTION}" 
     }
 
+#cases export endpoint (NDJSON stream for bulk consumers, e.g. Node-RED)
+@app.get("/cases/export")
+# Stream every case as one JSON object per line
+async def export_cases():
+    """
+    Stream all cases as NDJSON without loading the collection into memory
+    If Qdrant fails mid-stream the last line is {"error": ..., "complete": false} - the status is already 200 by then
+    """
+    async def ndjson_lines():
+        exported = 0
+        try:
+            async for case in aiter_cases():
+                yield json.dumps(case, ensure_ascii=False) + "\n"
+                exported += 1
+        except Exception as e:
+            print(f"Error exporting cases after {exported} records: {e}")
+            yield json.dumps({"error": f"Export failed: {e}", "complete": False, "exported": exported}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 #db info endpoint
 @app.get("/info")
 # Return basic database information and collection counts
 async def get_database_info_endpoint():
     """Get database information"""
-    return get_database_info()
+    return await aget_database_info()
 
 @app.post("/ingest/knowledge-base")
-# Trigger ingestion of the knowledge base folder into Qdrant
+# Trigger ingestion of the knowledge base folder into Qdrant (force=true: background reindex + alias swap)
 async def ingest_knowledge_base(force: bool = False):
     """Ingest all documents from knowledge_base folder"""
-    result = document_ingestor.ingest_knowledge_base(force_reingest=force)
+    if force:
+        return document_ingestor.start_reindex("knowledge_base")
+    result = document_ingestor.ingest_knowledge_base()
     return result
 
 @app.post("/ingest/special-cases")
-# Trigger ingestion of special cases into Qdrant
+# Trigger ingestion of special cases into Qdrant (force=true: background reindex + alias swap)
 async def ingest_special_cases(force: bool = False):
     """Ingest all documents from special_cases folder"""
-    result = document_ingestor.ingest_special_cases(force_reingest=force)
+    if force:
+        return document_ingestor.start_reindex("special_cases")
+    result = document_ingestor.ingest_special_cases()
     return result
 
 @app.post("/ingest/all")
 # Run ingestion for both knowledge base and special cases
 async def ingest_all(force: bool = False):
     """Ingest all documents from both folders"""
-    kb_result = document_ingestor.ingest_knowledge_base(force_reingest=force)
-    sc_result = document_ingestor.ingest_special_cases(force_reingest=force)
+    if force:
+        return {
+            "knowledge_base": document_ingestor.start_reindex("knowledge_base"),
+            "special_cases": document_ingestor.start_reindex("special_cases")
+        }
+    
+    kb_result = document_ingestor.ingest_knowledge_base()
+    sc_result = document_ingestor.ingest_special_cases()
     
     return {
         "knowledge_base": kb_result,
         "special_cases": sc_result
     }
 
+@app.get("/ingest/status")
+# Return state of background reindex jobs and the collection versions being served
+async def ingest_status():
+    """Background reindex status"""
+    from core.qdrant_service import qdrant_service
+    return {
+        "reindex": document_ingestor.reindex_status,
+        "serving": {
+            key: await asyncio.to_thread(qdrant_service.resolve_collection, key)
+            for key in qdrant_service.collections
+        }
+    }
+
 @app.get("/collections/info")
 # Return detailed information about all Qdrant collections
 async def get_collections_info():
@@ -180,6 +248,52 @@ async def get_collections_info():
     from core.qdrant_service import qdrant_service
     return qdrant_service.get_database_info()
 
+@app.get("/metrics")
+# Return in-process latency histograms and counters
+async def get_metrics():
+    """Latency and cache metrics collected by the core services"""
+    from core.metrics import metrics
+    from core.reranker import reranker
+    from core.answer_cache import answer_cache
+    from core.llm_service import llm_service
+    from core.qdrant_service import qdrant_service
+    return {
+        **metrics.snapshot(),
+        "reranker": reranker.get_info(),
+        "answer_cache": answer_cache.get_info(),
+        "llm_cache": llm_service.cache.get_info() if llm_service.cache else None,
+        "ollama_pool": llm_service.pool.get_info(),
+        "vector_mirror": qdrant_service.vector_mirror.get_info() if qdrant_service.vector_mirror else None
+    }
+
+@app.post("/admin/llm-cache/flush")
+# Drop all cached LLM responses (memory and SQLite tiers)
+async def flush_llm_cache():
+    """Flush the exact LLM response cache"""
+    from core.llm_service import llm_service
+    if not llm_service.cache:
+        return {"status": "disabled"}
+    return {"status": "flushed", "removed": await asyncio.to_thread(llm_service.cache.clear)}
+
+@app.post("/vector-mirror/benchmark")
+# Compare in-process mirror search with the Qdrant path (latency percentiles + top-k agreement)
+async def benchmark_vector_mirror(payload: dict = Body(default={})):
+    """Body: {"queries": [...], "collection": "knowledge_base", "limit": 10, "rounds": 3}"""
+    from core.qdrant_service import qdrant_service
+    if not qdrant_service.vector_mirror:
+        return {"status": "error", "message": "Vector mirror disabled (VECTOR_MIRROR_ENABLED=false)"}
+    
+    queries = payload.get("queries") or [
+        "jak złożyć wniosek o urlop dziekański",
+        "stawki stypendiów",
+        "termin egzaminu poprawkowego",
+        "zwolnienie z opłat za studia",
+    ]
+    return await asyncio.to_thread(
+        qdrant_service.vector_mirror.benchmark, queries,
+        payload.get("collection", "knowledge_base"), int(payload.get("limit", 10)), int(payload.get("rounds", 3))
+    )
+
 @app.get("/files/paths")
 # Return configured file paths and existence flags
 async def get_file_paths():
@@ -0,0 +1,218 @@
+#imports
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import numpy as np
+from typing import Dict, Any, Optional
+from .config import (
+    ANSWER_CACHE_PATH, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIZE,
+)
+from .metrics import metrics
+from .document_store import document_store
+
+#class: SemanticAnswerCache - final answers reused for near-duplicate questions (cosine on query embeddings)
+class SemanticAnswerCache:
+    """
+    Entry = (query embedding, answer, doc_id + file hash of the document the answer was built from).
+    A lookup hits when cosine >= threshold, the entry is within TTL and belongs to the current index generation.
+    When the generation changes, entries are revalidated against the document store: answers whose
+    document changed (or that had no document, e.g. "not found") are dropped, the rest are carried over.
+    Entries live in memory (one matrix for the similarity search) and in SQLite, so they survive restarts.
+    """
+    def __init__(self, db_path: str = ANSWER_CACHE_PATH, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS, max_entries: int = ANSWER_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> entry dict
+        self._keys = []
+        self._matrix = None  # rows aligned with _keys; rebuilt lazily after changes
+        self._generation = None
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    query TEXT,
+                    embedding BLOB,
+                    doc_id TEXT,
+                    doc_hash TEXT,
+                    result TEXT,
+                    latency_ms REAL,
+                    created_at REAL,
+                    last_used REAL
+                )
+            """)
+        self._load()
+
+    #method: load persisted entries (revalidated on the first lookup - generation is unknown after a restart)
+    def _load(self):
+        now = time.time()
+        rows = self._conn.execute(
+            "SELECT key, query, embedding, doc_id, doc_hash, result, latency_ms, created_at, last_used FROM answers"
+        ).fetchall()
+        for key, query, embedding, doc_id, doc_hash, result, latency_ms, created_at, last_used in rows:
+            if now - created_at > self.ttl_seconds:
+                continue
+            self._entries[key] = {
+                "query": query,
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+                "doc_id": doc_id,
+                "doc_hash": doc_hash,
+                "result": json.loads(result),
+                "latency_ms": latency_ms,
+                "created_at": created_at,
+                "last_used": last_used
+            }
+        self._matrix = None
+        print(f"Answer cache: {len(self._entries)} entries loaded")
+
+    #method: drop entries from memory and disk (caller holds the lock)
+    def _delete(self, keys):
+        if not keys:
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+        with self._conn:
+            self._conn.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys])
+        self._matrix = None
+
+    #method: index generation changed - keep only answers whose document is unchanged (caller holds the lock)
+    def _revalidate(self, generation: int):
+        stored = document_store.get_documents([entry["doc_id"] for entry in self._entries.values()])
+        stale = [
+            key for key, entry in self._entries.items()
+            if not entry["doc_id"] or (stored.get(entry["doc_id"]) or {}).get("file_hash") != entry["doc_hash"]
+        ]
+        self._delete(stale)
+        if stale:
+            print(f"Answer cache: index generation {generation} - {len(stale)} entries invalidated")
+            metrics.increment("answer_cache_invalidations", len(stale))
+        self._generation = generation
+
+    #method: similarity matrix over all entries (rows normalized)
+    def _get_matrix(self):
+        if self._matrix is None:
+            self._keys = list(self._entries.keys())
+            self._matrix = np.stack([self._entries[key]["embedding"] for key in self._keys]) if self._keys else None
+        return self._matrix
+
+    #method: normalize a query embedding
+    def _normalize(self, query_vector) -> np.ndarray:
+        vector = np.asarray(query_vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    #method: find a cached answer for a (near-)duplicate query
+    def lookup(self, query_vector, generation: int) -> Optional[Dict[str, Any]]:
+        """Returns a copy of the cached result with a "cache" section, or None"""
+        start = time.perf_counter()
+        with self._lock:
+            if generation != self._generation:
+                self._revalidate(generation)
+
+            matrix = self._get_matrix()
+            if matrix is None:
+                metrics.increment("answer_cache_misses")
+                return None
+
+            similarities = matrix @ self._normalize(query_vector)
+            row = int(np.argmax(similarities))
+            similarity = float(similarities[row])
+            key = self._keys[row]
+            entry = self._entries[key]
+
+            if similarity < self.threshold:
+                metrics.increment("answer_cache_misses")
+                return None
+            if time.time() - entry["created_at"] > self.ttl_seconds:
+                self._delete([key])
+                metrics.increment("answer_cache_misses")
+                return None
+
+            entry["last_used"] = time.time()
+            with self._conn:
+                self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (entry["last_used"], key))
+
+        lookup_ms = (time.perf_counter() - start) * 1000
+        metrics.increment("answer_cache_hits")
+        metrics.increment("answer_cache_latency_saved_ms", max(entry["latency_ms"] - lookup_ms, 0))
+        metrics.observe("answer_cache_lookup_ms", lookup_ms)
+
+        result = json.loads(json.dumps(entry["result"]))
+        result["cache"] = {
+            "hit": True,
+            "similarity": round(similarity, 4),
+            "cached_query": entry["query"],
+            "age_seconds": round(time.time() - entry["created_at"], 1)
+        }
+        return result
+
+    #method: store an answer
+    def put(self, query: str, query_vector, result: Dict[str, Any], generation: int,
+            doc_id: str = None, doc_hash: str = None, latency_ms: float = 0.0):
+        """doc_id/doc_hash identify the document the answer was built from (None for "not found" answers)"""
+        now = time.time()
+        key = uuid.uuid4().hex
+        embedding = self._normalize(query_vector)
+        with self._lock:
+            if generation != self._generation:
+                self._revalidate(generation)
+
+            # Size bound: evict least recently used entries
+            overflow = len(self._entries) + 1 - self.max_entries
+            if overflow > 0:
+                oldest = sorted(self._entries, key=lambda k: self._entries[k]["last_used"])[:overflow]
+                self._delete(oldest)
+                metrics.increment("answer_cache_evictions", len(oldest))
+
+            self._entries[key] = {
+                "query": query,
+                "embedding": embedding,
+                "doc_id": doc_id,
+                "doc_hash": doc_hash,
+                "result": result,
+                "latency_ms": latency_ms,
+                "created_at": now,
+                "last_used": now
+            }
+            self._matrix = None
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO answers (key, query, embedding, doc_id, doc_hash, result, latency_ms, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, query, embedding.tobytes(), doc_id, doc_hash, json.dumps(result, ensure_ascii=False), latency_ms, now, now)
+                )
+
+    #method: remove every entry
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._matrix = None
+            with self._conn:
+                self._conn.execute("DELETE FROM answers")
+        return count
+
+    #method: summary for /metrics
+    def get_info(self) -> Dict[str, Any]:
+        hits = metrics.get_counter("answer_cache_hits")
+        misses = metrics.get_counter("answer_cache_misses")
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "latency_saved_ms": round(metrics.get_counter("answer_cache_latency_saved_ms"), 1)
+        }
+
+
+# Singleton instance
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,134 @@
+#imports
+import re
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any
+from .config import (
+    COMPRESSION_TARGET_RATIO, COMPRESSION_MIN_CHARS, COMPRESSION_WINDOW, COMPRESSION_CACHE_SIZE,
+)
+from .metrics import metrics
+
+# Sentence boundaries: end punctuation followed by whitespace, or line breaks
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+# Lines kept verbatim (packed-context document headers and gap markers)
+PINNED_PATTERN = re.compile(r"^(=== .* ===|\[\.\.\.\])$")
+
+#class: ExtractiveCompressor - keeps the sentences closest to the query (plus neighbours) up to a length target
+class ExtractiveCompressor:
+    def __init__(self, target_ratio: float = COMPRESSION_TARGET_RATIO, min_chars: int = COMPRESSION_MIN_CHARS,
+                 window: int = COMPRESSION_WINDOW, cache_size: int = COMPRESSION_CACHE_SIZE):
+        self.target_ratio = target_ratio
+        self.min_chars = min_chars
+        self.window = window
+        self.cache_size = cache_size
+
+        # Sentence embeddings by text hash - the same documents are compressed again and again
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    #method: split text into sentences (pinned lines stay separate units)
+    def split(self, text: str) -> List[str]:
+        return [sentence.strip() for sentence in SENTENCE_SPLIT.split(text) if sentence and sentence.strip()]
+
+    #method: embed sentences, reusing cached vectors; missing ones go through the embedder in one batch
+    async def _embed(self, sentences: List[str]) -> np.ndarray:
+        from .qdrant_service import qdrant_service
+
+        keys = [hashlib.md5(sentence.encode("utf-8")).hexdigest() for sentence in sentences]
+        with self._cache_lock:
+            vectors = [self._cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            embedded = np.asarray(await qdrant_service.aembed([sentences[i] for i in missing]), dtype=np.float32)
+            embedded /= np.linalg.norm(embedded, axis=1, keepdims=True).clip(min=1e-12)
+            with self._cache_lock:
+                for i, vector in zip(missing, embedded):
+                    vectors[i] = vector
+                    self._cache[keys[i]] = vector
+                    self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        metrics.increment("compression_sentences_embedded", len(missing))
+        return np.stack(vectors)
+
+    #method: choose sentence indices - best-scoring first, each with its neighbour window, until the target is reached
+    def select(self, sentences: List[str], scores: np.ndarray, pinned: List[bool], target_chars: int) -> List[int]:
+        # Sections end at pinned lines; a window never reaches into another document
+        section, current = [], 0
+        for is_pinned in pinned:
+            current += is_pinned
+            section.append(current)
+
+        kept = {i for i, is_pinned in enumerate(pinned) if is_pinned}
+        length = sum(len(sentences[i]) for i in kept)
+        for i in np.argsort(-scores):
+            if length >= target_chars:
+                break
+            if pinned[i]:
+                continue
+            for j in range(max(0, i - self.window), min(len(sentences), i + self.window + 1)):
+                if j not in kept and not pinned[j] and section[j] == section[i]:
+                    kept.add(j)
+                    length += len(sentences[j])
+        return sorted(kept)
+
+    #method: compress a document (or packed context) for one query
+    async def acompress(self, text: str, query_vector: List[float]) -> Dict[str, Any]:
+        """
+        Returns {"text", "applied", "original_chars", "compressed_chars", "ratio",
+        "sentences_kept", "sentences_total", "latency_ms"}. Texts under min_chars are returned unchanged,
+        longer ones are cut to about target_ratio of their length; applied is False when no sentence was dropped.
+        """
+        start = time.perf_counter()
+        sentences = self.split(text)
+        if len(text) <= self.min_chars or len(sentences) < 3:
+            return self._unchanged(text, sentences, 0.0)
+
+        pinned = [bool(PINNED_PATTERN.match(sentence)) for sentence in sentences]
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        # One matrix-vector product scores every sentence
+        scores = await self._embed(sentences) @ query
+        kept = self.select(sentences, scores, pinned, int(len(text) * self.target_ratio))
+        if len(kept) == len(sentences):
+            return self._unchanged(text, sentences, (time.perf_counter() - start) * 1000)
+
+        parts, previous = [], None
+        for i in kept:
+            if previous is not None and i != previous + 1 and not pinned[i] and parts[-1] != "[...]":
+                parts.append("[...]")
+            parts.append(sentences[i])
+            previous = i
+        compressed = "\n".join(parts)
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        ratio = round(len(compressed) / len(text), 3)
+        metrics.observe("compression_latency_ms", latency_ms)
+        metrics.observe("compression_ratio_pct", ratio * 100, buckets=(10, 20, 30, 40, 50, 60, 70, 80, 90, 100))
+        return {
+            "text": compressed,
+            "applied": True,
+            "original_chars": len(text),
+            "compressed_chars": len(compressed),
+            "ratio": ratio,
+            "sentences_kept": len(kept),
+            "sentences_total": len(sentences),
+            "latency_ms": round(latency_ms, 1)
+        }
+
+    #method: result for a text sent as it is
+    def _unchanged(self, text: str, sentences: List[str], latency_ms: float) -> Dict[str, Any]:
+        return {"text": text, "applied": False, "original_chars": len(text), "compressed_chars": len(text),
+                "ratio": 1.0, "sentences_kept": len(sentences), "sentences_total": len(sentences),
+                "latency_ms": round(latency_ms, 1)}
+
+
+# Singleton instance
+compressor = ExtractiveCompressor()
@@ -9,11 +9,148 @@ QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
 SPECIAL_CASES_COLLECTION = os.getenv("SPECIAL_CASES_COLLECTION", "agent4_bos_cases")
 KNOWLEDGE_BASE_COLLECTION = os.getenv("KNOWLEDGE_BASE_COLLECTION", "agent4_knowledge_base")
 
+# Collections are served through aliases (the names above) pointing at versioned collections
+# (e.g. agent4_knowledge_base -> agent4_knowledge_base_v17); a full reindex builds a new version and swaps the alias
+COLLECTION_VERSIONS_TO_KEEP = int(os.getenv("COLLECTION_VERSIONS_TO_KEEP", "0"))  # old versions kept after a swap
+
+# Embedding executor - threads used by the async Qdrant API to run SentenceTransformer off the event loop
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+
+
+# Retrieval tuning
+MIN_CONFIDENCE = float(os.getenv("MIN_CONFIDENCE", "35"))  # percent; pushed down to Qdrant as score_threshold
+KNOWLEDGE_SEARCH_LIMIT = int(os.getenv("KNOWLEDGE_SEARCH_LIMIT", "200"))  # max knowledge chunks per query
+SPECIAL_CASES_SEARCH_LIMIT = int(os.getenv("SPECIAL_CASES_SEARCH_LIMIT", "50"))
+ADAPTIVE_TOP_K = os.getenv("ADAPTIVE_TOP_K", "true").lower() == "true"  # start small, widen only when needed
+ADAPTIVE_K_INITIAL = int(os.getenv("ADAPTIVE_K_INITIAL", "20"))
+ADAPTIVE_K_GAP = float(os.getenv("ADAPTIVE_K_GAP", "0.05"))  # score drop that counts as a "clear gap"
+
+# Hybrid retrieval - dense vector + BM25-style sparse vector, fused with reciprocal rank fusion (RRF)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_SEARCH_LIMIT = int(os.getenv("HYBRID_SEARCH_LIMIT", "40"))  # candidates per leg (dense / sparse)
+RRF_K = int(os.getenv("RRF_K", "60"))
+SPARSE_VECTOR_NAME = "bm25"
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_AVG_DOC_LENGTH = float(os.getenv("BM25_AVG_DOC_LENGTH", "150"))  # tokens per chunk (1000-char chunks)
+
+# Cross-encoder reranking of the top grouped candidates (optional)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "400"))  # keep retrieval order if scoring takes longer
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "2048"))  # LRU entries keyed by (query, chunk hash)
+RERANK_MAX_CHARS = int(os.getenv("RERANK_MAX_CHARS", "1500"))
+
+# Scrolling / case listing
+SCROLL_PAGE_SIZE = int(os.getenv("SCROLL_PAGE_SIZE", "256"))  # points per scroll request when iterating a collection
+CASES_PAGE_LIMIT = int(os.getenv("CASES_PAGE_LIMIT", "100"))  # default page size for GET /cases
+CASES_PAGE_MAX = int(os.getenv("CASES_PAGE_MAX", "1000"))
+
+# In-process vector mirror (NumPy brute-force search; automatic fallback when Qdrant is unreachable)
+VECTOR_MIRROR_ENABLED = os.getenv("VECTOR_MIRROR_ENABLED", "false").lower() == "true"
+VECTOR_MIRROR_SERVE = os.getenv("VECTOR_MIRROR_SERVE", "false").lower() == "true"  # serve dense searches from the mirror, not only as fallback
+VECTOR_MIRROR_DTYPE = os.getenv("VECTOR_MIRROR_DTYPE", "float32")  # or float16 (half the memory)
+
+# Collection stats view (counts served from cache; refreshed on ingestion events or after the TTL)
+STATS_TTL_SECONDS = float(os.getenv("STATS_TTL_SECONDS", "30"))
+
 
 # local data folder paths
 BASE_DATA_PATH = os.getenv("BASE_DATA_PATH", "/app/qdrant_data")
 KNOWLEDGE_BASE_PATH = os.path.join(BASE_DATA_PATH, "knowledge_base")
 SPECIAL_CASES_PATH = os.path.join(BASE_DATA_PATH, "special_cases")
+# Internal SQLite stores - outside BASE_DATA_PATH, which app.py serves as static files under /data
+STORAGE_PATH = os.getenv("STORAGE_PATH", "/app/storage")
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", os.path.join(STORAGE_PATH, "documents.sqlite3"))  # full texts + document metadata
+
+# LLM (Ollama) - default model plus per-task routing; a task without its own model uses LLM_MODEL
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://ollama:11434")
+
+# Ollama endpoint pool - comma-separated URLs; each call goes to an endpoint with the model loaded,
+# then by least outstanding requests x latency EWMA; failing endpoints are ejected for a while
+LLM_BASE_URLS = [url.strip() for url in os.getenv("LLM_BASE_URLS", LLM_BASE_URL).split(",") if url.strip()]
+OLLAMA_POOL_EWMA_ALPHA = float(os.getenv("OLLAMA_POOL_EWMA_ALPHA", "0.3"))
+OLLAMA_POOL_EJECT_AFTER = int(os.getenv("OLLAMA_POOL_EJECT_AFTER", "3"))  # consecutive failures
+OLLAMA_POOL_EJECT_SECONDS = float(os.getenv("OLLAMA_POOL_EJECT_SECONDS", "30"))
+OLLAMA_POOL_PS_TTL = float(os.getenv("OLLAMA_POOL_PS_TTL", "30"))  # seconds between /api/ps checks of loaded models
+OLLAMA_POOL_COLD_PENALTY = float(os.getenv("OLLAMA_POOL_COLD_PENALTY", "4"))  # score multiplier for endpoints without the model loaded
+
+#function: per-task model, Ollama options and timeout from env (LLM_MODEL_<TASK>, LLM_TEMPERATURE_<TASK>, ...)
+def _llm_task(name: str, temperature: float, num_predict: int, timeout: float, stop: str = "") -> dict:
+    suffix = name.upper()
+    options = {
+        "temperature": float(os.getenv(f"LLM_TEMPERATURE_{suffix}", str(temperature))),
+        "num_predict": int(os.getenv(f"LLM_NUM_PREDICT_{suffix}", str(num_predict)))
+    }
+    stop = os.getenv(f"LLM_STOP_{suffix}", stop)  # stop sequences separated by "|", "\\n" for a newline
+    if stop:
+        options["stop"] = [sequence.replace("\\n", "\n") for sequence in stop.split("|")]
+    return {
+        "model": os.getenv(f"LLM_MODEL_{suffix}", LLM_MODEL),
+        "options": options,
+        "timeout": float(os.getenv(f"LLM_TIMEOUT_{suffix}", str(timeout)))
+    }
+
+# classify / generate_document return JSON constrained by a schema; for classify "\n\n" stops trailing whitespace
+# after the object (not for generate_document - its multi-paragraph content may contain a blank line)
+LLM_TASKS = {
+    "classify": _llm_task("classify", 0.1, 24, 30, stop="\\n\\n"),  # {"category": ...} - a 0.5-1.5B model is enough
+    "suggest": _llm_task("suggest", 0.3, 300, 60),  # "would you like me to generate this?"
+    "answer": _llm_task("answer", 0.1, 2000, 300),
+    "generate_document": _llm_task("generate_document", 0.4, 2500, 600),
+}
+LLM_DEFAULT_TASK = "answer"
+
+# Per-request deadline (end-to-end budget for /support; overridable per request with the header below)
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "60000"))
+REQUEST_DEADLINE_MAX_MS = float(os.getenv("REQUEST_DEADLINE_MAX_MS", "300000"))  # upper bound for header values
+REQUEST_DEADLINE_HEADER = os.getenv("REQUEST_DEADLINE_HEADER", "X-Request-Deadline-Ms")
+DEADLINE_CLASSIFY_SHARE = float(os.getenv("DEADLINE_CLASSIFY_SHARE", "0.2"))  # max share of the remaining budget for classification
+DEADLINE_ANSWER_MIN_MS = float(os.getenv("DEADLINE_ANSWER_MIN_MS", "3000"))  # less left -> degraded answer without calling the LLM
+DEADLINE_SNIPPET_CHARS = int(os.getenv("DEADLINE_SNIPPET_CHARS", "600"))  # extractive snippet length in degraded answers
+
+# Fixed replies (not found / generation confirmation / generation result) come from response_templates;
+# true = let the LLM phrase the "not found" reply instead (one extra LLM round trip on that path)
+RESPONSE_LLM_PHRASING = os.getenv("RESPONSE_LLM_PHRASING", "false").lower() == "true"
+
+# Startup warm-up and model pinning (GET /ready reports ready once warm-up and the initial index check are done)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")  # sent with every Ollama call; "-1" keeps models loaded forever
+LLM_KEEP_ALIVE_INTERVAL = float(os.getenv("LLM_KEEP_ALIVE_INTERVAL", "300"))  # seconds between background pings (0 = off)
+
+# Exact LLM response cache (key: model, hash of system + prompt + JSON schema, temperature, num_predict)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))  # in-memory LRU entries
+LLM_CACHE_SQLITE = os.getenv("LLM_CACHE_SQLITE", "false").lower() == "true"  # persistent second tier
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(STORAGE_PATH, "llm_cache.sqlite3"))
+LLM_CACHE_SQLITE_SIZE = int(os.getenv("LLM_CACHE_SQLITE_SIZE", "20000"))  # SQLite rows kept (least recently used dropped)
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "604800"))  # SQLite entry age limit (0 = no limit)
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))  # hotter calls bypass the cache...
+LLM_CACHE_HIGH_TEMPERATURE = os.getenv("LLM_CACHE_HIGH_TEMPERATURE", "false").lower() == "true"  # ...unless enabled here
+
+# Token-budgeted context packing for RAG prompts
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "true").lower() == "true"
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "NousResearch/Meta-Llama-3-8B-Instruct")  # HF tokenizer of the answer model
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "3.0"))  # estimate when the tokenizer cannot be loaded
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # tokens of document context per prompt
+CONTEXT_MAX_DOCS = int(os.getenv("CONTEXT_MAX_DOCS", "3"))  # top documents whose chunks compete for the budget
+CONTEXT_PROMPT_RESERVE = int(os.getenv("CONTEXT_PROMPT_RESERVE", "512"))  # question + instructions
+
+# Query-focused extractive compression of the prompt context
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_TARGET_RATIO = float(os.getenv("COMPRESSION_TARGET_RATIO", "0.35"))  # keep ~35% of the characters
+COMPRESSION_MIN_CHARS = int(os.getenv("COMPRESSION_MIN_CHARS", "2000"))  # shorter contexts are sent as they are
+COMPRESSION_WINDOW = int(os.getenv("COMPRESSION_WINDOW", "1"))  # neighbour sentences kept around each selected one
+COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", "20000"))  # cached sentence embeddings
+
+# Semantic answer cache (final answers reused for near-duplicate questions; persisted next to the document store)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(STORAGE_PATH, "answer_cache.sqlite3"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity between query embeddings
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
 
 # Create directories on import
 def ensure_directories():
@@ -0,0 +1,144 @@
+#imports
+import math
+import threading
+from typing import List, Dict, Any
+from .config import (
+    CONTEXT_TOKENIZER, CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_DOCS, CONTEXT_PROMPT_RESERVE, CONTEXT_CHARS_PER_TOKEN,
+)
+from .metrics import metrics
+
+#class: TokenCounter - counts tokens with the target model's tokenizer (character estimate if it cannot be loaded)
+class TokenCounter:
+    def __init__(self, tokenizer_name: str = CONTEXT_TOKENIZER, chars_per_token: float = CONTEXT_CHARS_PER_TOKEN):
+        self.tokenizer_name = tokenizer_name
+        self.chars_per_token = chars_per_token
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    #method: load the Hugging Face tokenizer on first use
+    def _get_tokenizer(self):
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                if self.tokenizer_name:
+                    try:
+                        from transformers import AutoTokenizer
+                        self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                        print(f"Context packer tokenizer: {self.tokenizer_name}")
+                    except Exception as e:
+                        print(f"WARNING: could not load tokenizer {self.tokenizer_name} ({e}) - estimating {self.chars_per_token} chars/token")
+                        metrics.increment("context_tokenizer_load_failures")
+            return self._tokenizer
+
+    #method: load the tokenizer ahead of the first request (startup warm-up); False = character estimate
+    def load(self) -> bool:
+        return self._get_tokenizer() is not None
+
+    #property: what the counts are based on - tokenizer name, or "estimate" for the character fallback
+    @property
+    def source(self) -> str:
+        return self.tokenizer_name if self._get_tokenizer() is not None else "estimate"
+
+    #method: number of tokens in a text
+    def count(self, text: str) -> int:
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            return math.ceil(len(text) / self.chars_per_token)
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    #method: cut a text to at most max_tokens tokens
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokenizer = self._get_tokenizer()
+        if tokenizer is None:
+            return text[:int(max_tokens * self.chars_per_token)]
+        ids = tokenizer.encode(text, add_special_tokens=False)
+        return tokenizer.decode(ids[:max_tokens]) if len(ids) > max_tokens else text
+
+
+#class: ContextPacker - fills a token budget with the highest-value chunks of the top documents
+class ContextPacker:
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, max_docs: int = CONTEXT_MAX_DOCS,
+                 prompt_reserve: int = CONTEXT_PROMPT_RESERVE):
+        self.token_budget = token_budget
+        self.max_docs = max_docs
+        self.prompt_reserve = prompt_reserve
+        self.counter = TokenCounter()
+
+    #method: num_ctx that fits budget + prompt scaffolding + answer
+    def num_ctx(self, num_predict: int) -> int:
+        """
+        Derived from the configured budget, not from each prompt: a num_ctx change between
+        requests makes Ollama reload the model, so the value stays constant. Rounded up to 1024.
+        """
+        return math.ceil((self.token_budget + self.prompt_reserve + num_predict) / 1024) * 1024
+
+    #method: document header inside the packed context
+    def _header(self, doc: Dict[str, Any]) -> str:
+        path = doc.get("source", "").replace("/app/qdrant_data/", "data/")
+        return f"=== {doc.get('filename', 'Unknown')} ({path}, dopasowanie {doc.get('confidence', 0)}%) ==="
+
+    #method: pack chunks of the top documents into the budget
+    def pack(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        documents: grouped knowledge docs, best first, each with "chunks" [{"index", "score", "text"}].
+        Chunks from all docs compete by retrieval score; selected chunks are emitted per document
+        (document rank order) and within a document in chunk_index order, "[...]" marking gaps.
+        Returns {"context", "documents", "tokens", "budget", "chunks_used", "chunks_total", "tokenizer"}.
+        """
+        documents = documents[:self.max_docs]
+        headers = {id(doc): self._header(doc) for doc in documents}
+        candidates = sorted(
+            ((chunk.get("score", 0), rank, chunk) for rank, doc in enumerate(documents) for chunk in doc.get("chunks", [])),
+            key=lambda item: (-item[0], item[1])
+        )
+
+        remaining = self.token_budget
+        selected = {}  # rank -> chunks
+        for _, rank, chunk in candidates:
+            cost = self.counter.count(chunk["text"])
+            if rank not in selected:
+                cost += self.counter.count(headers[id(documents[rank])])
+            if cost <= remaining:
+                selected.setdefault(rank, []).append(chunk)
+                remaining -= cost
+
+        # The best chunk is always included, truncated if it alone exceeds the budget
+        if not selected and candidates:
+            _, rank, chunk = candidates[0]
+            header = headers[id(documents[rank])]
+            text = self.counter.truncate(chunk["text"], max(self.token_budget - self.counter.count(header), 0))
+            selected[rank] = [dict(chunk, text=text)]
+            remaining = self.token_budget - self.counter.count(header) - self.counter.count(text)
+
+        sections, used_docs = [], []
+        for rank in sorted(selected):
+            doc = documents[rank]
+            parts, previous = [], None
+            for chunk in sorted(selected[rank], key=lambda c: c["index"]):
+                if previous is not None and chunk["index"] != previous + 1:
+                    parts.append("[...]")
+                parts.append(chunk["text"])
+                previous = chunk["index"]
+            sections.append(headers[id(doc)] + "\n" + "\n\n".join(parts))
+            used_docs.append(doc)
+
+        chunks_used = sum(len(chunks) for chunks in selected.values())
+        tokens = self.token_budget - remaining
+        tokenizer = self.counter.source
+        if tokenizer == "estimate":
+            metrics.increment("context_token_estimates")
+        metrics.observe("context_tokens", tokens, buckets=(256, 512, 1024, 2048, 3072, 4096, 6144, 8192))
+        return {
+            "context": "\n\n".join(sections),
+            "documents": used_docs,
+            "tokens": tokens,
+            "budget": self.token_budget,
+            "chunks_used": chunks_used,
+            "chunks_total": len(candidates),
+            "tokenizer": tokenizer
+        }
+
+
+# Singleton instance
+context_packer = ContextPacker()
@@ -0,0 +1,61 @@
+#imports
+import math
+import time
+from typing import Dict, Any, Optional
+from .config import REQUEST_DEADLINE_MS, REQUEST_DEADLINE_MAX_MS
+from .metrics import metrics
+
+#class: Deadline - end-to-end latency budget of one request, passed through every pipeline stage
+class Deadline:
+    def __init__(self, budget_ms: float = REQUEST_DEADLINE_MS):
+        self.budget_ms = budget_ms
+        self.started = time.perf_counter()
+        self.expires = self.started + budget_ms / 1000
+
+    #method: deadline from a request header value (milliseconds), config default if missing or invalid
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "Deadline":
+        try:
+            budget_ms = float(value) if value else REQUEST_DEADLINE_MS
+        except ValueError:
+            budget_ms = REQUEST_DEADLINE_MS
+        if not math.isfinite(budget_ms):
+            # "nan" / "inf" parse as floats but would make every remaining_ms() check meaningless
+            budget_ms = REQUEST_DEADLINE_MS
+        return cls(min(max(budget_ms, 0.0), REQUEST_DEADLINE_MAX_MS))
+
+    #method: milliseconds left (never negative)
+    def remaining_ms(self) -> float:
+        return max((self.expires - time.perf_counter()) * 1000, 0.0)
+
+    #method: seconds left - for HTTP timeouts and asyncio.wait_for
+    def remaining_s(self) -> float:
+        return self.remaining_ms() / 1000
+
+    #method: budget used up
+    def expired(self) -> bool:
+        return self.remaining_ms() <= 0
+
+    #method: can a stage that needs at least min_ms still start (counted in deadline_skipped otherwise)
+    def allows(self, stage: str, min_ms: float = 0.0) -> bool:
+        if self.remaining_ms() > min_ms:
+            return True
+        metrics.increment("deadline_skipped", stage=stage)
+        return False
+
+    #method: budget class for sharing work between requests - remaining seconds rounded down to a power of two
+    def bucket(self) -> int:
+        """0: under 2 s, 1: 2-4 s, 2: 4-8 s, ... - requests in one class get comparable (degraded or full) answers"""
+        return int(math.log2(max(self.remaining_s(), 1.0)))
+
+    #method: sub-budget for one stage - a share of what is left, so one slow stage cannot use up the whole request
+    def share(self, fraction: float) -> "Deadline":
+        return Deadline(self.remaining_ms() * fraction)
+
+    #method: summary attached to responses
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "budget_ms": self.budget_ms,
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "remaining_ms": round(self.remaining_ms(), 1)
+        }
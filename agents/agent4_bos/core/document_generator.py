@@ -4,9 +4,34 @@ import time
 from datetime import datetime
 from docx import Document
 from .config import KNOWLEDGE_BASE_PATH, KNOWLEDGE_BASE_CATEGORIES, ALL_CATEGORIES_KEY
-from .llm_service import llm_service
+from .llm_service import llm_service, LLM_ERROR_PREFIX
 
 
+# Fixed instruction prefix (system message) - the topic follows in the user message, so the prefix is cacheable
+GENERATOR_SYSTEM_PROMPT = """Jesteś doświadczonym pracownikiem administracji uczelnianej.
+Użytkownik prosi o przygotowanie dokumentu na podstawie opisu.
+
+Twoim zadaniem jest:
+1. Zrozumieć intencję użytkownika i rodzaj potrzebnego dokumentu.
+2. Zaproponować profesjonalną nazwę pliku (krótką, bez polskich znaków, użyj podkreśleń zamiast spacji, np. Podanie_o_urlop).
+3. Nadać dokumentowi oficjalny tytuł z prefiksem "AI_GEN_" (np. "AI_GEN_Podanie_o_urlop").
+4. Przygotować kompletną treść dokumentu.
+
+Twoja odpowiedź MUSI być obiektem JSON:
+{"filename": "Nazwa_pliku_z_podkresleniami", "title": "Oficjalny Tytuł Dokumentu", "content": "Treść dokumentu (akapity oddzielone znakiem nowej linii)"}
+"""
+
+# Structured output - replaces the NAZWA_PLIKU / TYTUŁ / TREŚĆ line parser
+GENERATOR_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "filename": {"type": "string"},
+        "title": {"type": "string"},
+        "content": {"type": "string"}
+    },
+    "required": ["filename", "title", "content"]
+}
+
 #class: DocumentGenerator - generates documents based on user input using LLM and saves them as DOCX files
 class DocumentGenerator:
     def __init__(self):
@@ -21,7 +46,11 @@ class DocumentGenerator:
         print(f"GENERATOR: Rozpoczynam generowanie dokumentu. Temat: '{topic}', Kategoria: '{category}'")
         
         # LLM content generation
-        content = self._generate_content_with_llm(topic)
+        try:
+            content = self._generate_content_with_llm(topic)
+        except ValueError as e:
+            print(f"GENERATOR ERROR: {e}")
+            return {"success": False, "error": str(e)}
         
         # create DOCX file with the generated content
         file_info = self._create_docx_file(topic, content, category)
@@ -30,62 +59,32 @@ class DocumentGenerator:
     
     #method: generate content with LLM based on the provided topic
     def _generate_content_with_llm(self, topic: str) -> dict:
-        """Generates the title, filename and body of the document using LLM based on the provided topic."""
-
-        prompt = f"""Jesteś doświadczonym pracownikiem administracji uczelnianej.
-Użytkownik prosi o przygotowanie dokumentu na podstawie opisu: "{topic}"
-
-Twoim zadaniem jest:
-1. Zrozumieć intencję użytkownika i rodzaj potrzebnego dokumentu.
-2. Zaproponować profesjonalną nazwę pliku (krótką, bez polskich znaków, użyj podkreśleń zamiast spacji, np. Podanie_o_urlop).
-3. Nadać dokumentowi oficjalny tytuł z prefiksem "AI_GEN_" (np. "AI_GEN_Podanie_o_urlop").
-4. Przygotować kompletną treść dokumentu.
-
-Twoja odpowiedź MUSI być w formacie:
+        """
+        Generates the title, filename and body of the document using LLM based on the provided topic.
+        Raises ValueError when no complete document came back - a partial JSON is never saved as the body.
+        """
 
-NAZWA_PLIKU: [Nazwa_pliku_z_podkresleniami]
-TYTUŁ: [Oficjalny Tytuł Dokumentu]
-TREŚĆ:
-[Treść dokumentu...]
-"""
-        response = llm_service.generate_response(prompt, temperature=0.4, max_tokens=2500)
+        prompt = f'Użytkownik prosi o przygotowanie dokumentu na podstawie opisu: "{topic}"'
+        parsed, response = llm_service.generate_json(prompt, GENERATOR_SCHEMA, task="generate_document",
+                                                     system=GENERATOR_SYSTEM_PROMPT)
         
-        # Robust parser - line by line analysis to extract filename, title, and body
-        lines = response.strip().split('\n')
-        suggested_filename = None
-        title = None
-        body_lines = []
-        is_body = False
+        # Unparseable output is usually JSON cut off at num_predict - retry once with twice the limit
+        if parsed is None and not response.startswith(LLM_ERROR_PREFIX):
+            num_predict = llm_service.route("generate_document")["options"].get("num_predict", 2500) * 2
+            print(f"GENERATOR: niekompletny JSON, ponawiam z num_predict={num_predict}")
+            parsed, response = llm_service.generate_json(prompt, GENERATOR_SCHEMA, task="generate_document",
+                                                         system=GENERATOR_SYSTEM_PROMPT, max_tokens=num_predict)
         
-        for line in lines:
-            if is_body:
-                body_lines.append(line)
-                continue
-            
-            clean_line = line.strip()
-            if not clean_line:
-                continue
-                
-            upper_line = clean_line.upper()
-            if upper_line.startswith("NAZWA_PLIKU:"):
-                suggested_filename = line.split(":", 1)[1].strip()
-            elif upper_line.startswith("TYTUŁ:") or upper_line.startswith("TYTUL:"):
-                title = line.split(":", 1)[1].strip()
-            elif upper_line.startswith("TREŚĆ:") or upper_line.startswith("TRESC:"):
-                is_body = True
-            else:
-                if suggested_filename or title:
-                    is_body = True
-                    body_lines.append(line)
-        
-        body = "\n".join(body_lines).strip()
+        if parsed is None:
+            if response.startswith(LLM_ERROR_PREFIX):
+                raise ValueError(response)
+            raise ValueError("model nie zwrócił kompletnego dokumentu (niepoprawny lub ucięty JSON)")
         
-        #fallback - if parsing fails, use the entire response as body
-        if not body and not suggested_filename:
-            body = response
-            
-        if not title:
-            title = f"Dokument: {topic}"
+        body = parsed["content"].strip()
+        if not body:
+            raise ValueError("model zwrócił dokument bez treści")
+        title = parsed["title"].strip() or f"Dokument: {topic}"
+        suggested_filename = parsed["filename"].strip() or None
 
         return {"title": title, "body": body, "suggested_filename": suggested_filename}
 
@@ -1,6 +1,7 @@
 #imports
 import os
 import time
+import threading
 from pathlib import Path
 from typing import List, Dict, Any
 from watchdog.events import FileSystemEventHandler
@@ -10,12 +11,17 @@ from watchdog.observers import Observer
 from .config import KNOWLEDGE_BASE_PATH, SPECIAL_CASES_PATH
 from .document_processor import document_processor
 from .qdrant_service import qdrant_service
+from .document_store import document_store
 
 
 #class: DocumentIngestor - handles document ingestion from folders, processing, and saving to Qdrant
 class DocumentIngestor:
     def __init__(self):
         self.processed_files = {}
+        
+        # Background reindex state per collection
+        self.reindex_status = {}
+        self._reindex_lock = threading.Lock()
     
     #method: ingest knowledge base documents
     def ingest_knowledge_base(self, force_reingest: bool = False) -> Dict[str, Any]:
@@ -42,9 +48,78 @@ class DocumentIngestor:
             }
         }
     
+    #method: rebuild a collection into a fresh version and swap the alias (serving collection stays live)
+    def reindex(self, collection: str) -> Dict[str, Any]:
+        """
+        Full reindex without downtime:
+        build <alias>_vN+1, validate its point count, swap the alias, drop old versions.
+        Queries keep hitting the current version until the swap; document_store records are
+        replaced only after the swap, so they always describe the serving version.
+        """
+        folder_path = KNOWLEDGE_BASE_PATH if collection == "knowledge_base" else SPECIAL_CASES_PATH
+        target = qdrant_service.create_versioned_collection(collection)
+        print(f"  Reindexing {collection} into {target}")
+        
+        documents = []
+        result = self._ingest_folder(folder_path, collection, force_reingest=True, collection_name=target,
+                                     documents=documents)
+        stats = result["stats"]
+        
+        # Validate before serving: every chunk stored, and not an empty index built from failing files
+        stored = qdrant_service.count_points(target)
+        all_failed = stats["total_files"] > 0 and stats["processed_files"] == 0
+        if result["status"] != "success" or stored != stats["total_chunks"] or all_failed:
+            print(f"  Reindex validation failed for {target}: {stored} points, {stats['total_chunks']} chunks expected")
+            qdrant_service.drop_collection_version(target)
+            result["status"] = "error"
+            result["message"] = f"Validation failed ({stored}/{stats['total_chunks']} points) - serving collection unchanged"
+            return result
+        
+        qdrant_service.swap_alias(collection, target)
+        qdrant_service.gc_collection_versions(collection)
+        result["collection_version"] = target
+        
+        # Document records of the new version; records of deleted files are pruned
+        removed = document_store.replace_collection(collection, documents)
+        if removed:
+            print(f"  Removed {removed} stale document records from {collection}")
+        
+        # Catch up on files changed while the new version was being built
+        catch_up = self._ingest_folder(folder_path, collection)
+        stats["processed_files"] += catch_up["stats"]["processed_files"]
+        stats["total_chunks"] += catch_up["stats"]["total_chunks"]
+        
+        return result
+    
+    #method: run reindex in a background thread (one per collection at a time)
+    def start_reindex(self, collection: str) -> Dict[str, Any]:
+        """Start a background reindex; returns immediately"""
+        with self._reindex_lock:
+            if self.reindex_status.get(collection, {}).get("status") == "running":
+                return {"status": "already_running", "collection": collection}
+            self.reindex_status[collection] = {"status": "running", "started_at": time.time()}
+        
+        def run():
+            try:
+                result = self.reindex(collection)
+            except Exception as e:
+                print(f"Reindex of {collection} failed: {e}")
+                result = {"status": "error", "message": str(e)}
+            result["started_at"] = self.reindex_status[collection]["started_at"]
+            result["finished_at"] = time.time()
+            self.reindex_status[collection] = result
+        
+        threading.Thread(target=run, daemon=True).start()
+        return {"status": "started", "collection": collection}
+    
     #method: ingest all documents from a folder
-    def _ingest_folder(self, folder_path: str, collection: str, force_reingest: bool = False) -> Dict[str, Any]:
-        """Ingest all documents from a folder"""
+    def _ingest_folder(self, folder_path: str, collection: str, force_reingest: bool = False, collection_name: str = None,
+                       documents: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Ingest all documents from a folder (collection_name targets a specific collection version)
+        documents: if given, document records are collected there instead of written to document_store
+        (reindex writes them once its version is validated and served)
+        """
         folder = Path(folder_path)
         
         if not folder.exists():
@@ -85,17 +160,25 @@ class DocumentIngestor:
                     
                     # Process file
                     print(f"    Processing: {file_path.name}")
-                    chunks = document_processor.process_file(str(file_path))
+                    processed = document_processor.process_document(str(file_path))
+                    document = processed["document"]
+                    chunks = processed["chunks"]
+                    
+                    # Document record first - chunk payloads only reference it by doc_id
+                    if document and documents is not None:
+                        documents.append(document)
+                    elif document:
+                        document_store.save_document(document, collection)
                     
                     # Save each chunk to Qdrant
                     for chunk in chunks:
-                        qdrant_service.save_document_chunk(chunk, collection)
+                        qdrant_service.save_document_chunk(chunk, collection, collection_name=collection_name)
                         stats["total_chunks"] += 1
                     
                     # Mark as processed
                     self.processed_files[str(file_path)] = {
-                        "last_modified": file_path.stat().st_mtime,
-                        "file_hash": chunk["metadata"]["file_hash"] if chunks else "unknown",
+                        "last_modified": document["last_modified"] if document else file_path.stat().st_mtime,
+                        "file_hash": document["file_hash"] if document else "unknown",
                         "chunks": len(chunks),
                         "ingestion_time": time.time()
                     }
@@ -107,6 +190,10 @@ class DocumentIngestor:
                     stats["errors"].append(error_msg)
                     print(f"    ✗ {error_msg}")
         
+        # Refresh cached collection stats / index generation (a reindex target is not served yet)
+        if stats["processed_files"] and not collection_name:
+            qdrant_service.mark_index_changed(ingested=True)
+        
         return {
             "status": "success",
             "collection": collection,
@@ -167,11 +254,18 @@ class FileWatcher(FileSystemEventHandler):
             print(f"\nAuto-detected new/modified file in {folder_name}:")
             print(f"   File: {file_path_obj.name}")
             
-            chunks = document_processor.process_file(file_path)
+            processed = document_processor.process_document(file_path)
+            chunks = processed["chunks"]
+            
+            if processed["document"]:
+                document_store.save_document(processed["document"], collection)
             
             for chunk in chunks:
                 qdrant_service.save_document_chunk(chunk, collection)
             
+            if chunks:
+                qdrant_service.mark_index_changed(ingested=True)
+            
             print(f"Auto-ingested: {len(chunks)} chunks")
             
         except Exception as e:
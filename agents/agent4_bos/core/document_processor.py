@@ -8,6 +8,7 @@ from typing import List, Dict, Any
 import docx
 from PyPDF2 import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .document_store import make_doc_id
 
 #class: DocumentProcessor - handles document processing (text extraction, chunking, metadata)
 class DocumentProcessor:
@@ -67,51 +68,63 @@ class DocumentProcessor:
     #method: process file into chunks with metadata
     def process_file(self, filepath: str) -> List[Dict[str, Any]]:
         """Process a file into chunks with metadata"""
+        return self.process_document(filepath)["chunks"]
+    
+    #method: process file into a document record (full text, document metadata) and its chunks
+    def process_document(self, filepath: str) -> Dict[str, Any]:
+        """Process a file into {"document": {...} or None, "chunks": [...]}"""
         filepath = Path(filepath)
+        empty = {"document": None, "chunks": []}
         
         # Extract text
         try:
             text = self.extract_text(filepath)
         except Exception as e:
             print(f"Error extracting text from {filepath}: {e}")
-            return []
+            return empty
         
         if not text.strip():
             print(f"No text content in {filepath}")
-            return []
+            return empty
         
         # Split into chunks
         chunks = self.text_splitter.split_text(text)
         
-        # Create records
+        # Document-level metadata - file is stat'ed and hashed once, kept in one per-document record
+        stat = filepath.stat()
+        doc_id = make_doc_id(str(filepath))
+        category = self._determine_category(str(filepath))
+        
+        document = {
+            "doc_id": doc_id,
+            "source_file": str(filepath),
+            "filename": filepath.name,
+            "file_extension": filepath.suffix.lower(),
+            "file_size": stat.st_size,
+            "file_hash": self._calculate_file_hash(filepath),
+            "total_chunks": len(chunks),
+            "category": category,
+            "ingestion_time": time.time(),
+            "last_modified": stat.st_mtime,
+            "text": text
+        }
+        
+        # Chunk records carry only what search needs: doc ID, position and category (filter key)
         records = []
         
         for i, chunk in enumerate(chunks):
-            # Create unique ID
-            chunk_id = str(uuid.uuid4())
-            
-            # Determine category from folder structure
-            category = self._determine_category(str(filepath))
-            
             record = {
-                "id": chunk_id,
+                "id": str(uuid.uuid4()),
                 "text": chunk,
                 "metadata": {
-                    "source_file": str(filepath),
-                    "filename": filepath.name,
-                    "file_extension": filepath.suffix.lower(),
-                    "file_size": filepath.stat().st_size,
-                    "file_hash": self._calculate_file_hash(filepath),
+                    "doc_id": doc_id,
                     "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    "category": category,
-                    "ingestion_time": time.time(),
-                    "last_modified": filepath.stat().st_mtime
+                    "category": category
                 }
             }
             records.append(record)
         
-        return records
+        return {"document": document, "chunks": records}
     
     #method: determine category from file path
     def _determine_category(self, filepath: str) -> str:
@@ -0,0 +1,100 @@
+#imports
+import os
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional
+from .config import DOCUMENT_STORE_PATH
+
+#function: stable document id derived from the source path
+def make_doc_id(source_file: str) -> str:
+    return hashlib.md5(str(source_file).encode("utf-8")).hexdigest()[:16]
+
+#class: DocumentStore - local SQLite store with full document text and document-level metadata
+class DocumentStore:
+    def __init__(self, db_path: str = DOCUMENT_STORE_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        # One shared connection; sqlite calls are short, a lock serializes them across threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    #method: create tables if they don't exist
+    def _create_tables(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    source_file TEXT NOT NULL,
+                    filename TEXT,
+                    file_extension TEXT,
+                    file_size INTEGER,
+                    file_hash TEXT,
+                    category TEXT,
+                    collection TEXT,
+                    total_chunks INTEGER,
+                    ingestion_time REAL,
+                    last_modified REAL,
+                    text TEXT
+                )
+            """)
+
+    #method: insert or replace one document
+    def save_document(self, document: Dict[str, Any], collection: str):
+        """document: doc_id, source_file, filename, ... , total_chunks, text (full extracted text)"""
+        with self._lock, self._conn:
+            self._insert(document, collection)
+
+    #method: make the collection's records exactly the given documents (after a reindex is swapped in)
+    def replace_collection(self, collection: str, documents: List[Dict[str, Any]]) -> int:
+        """Upserts every document and removes records of files no longer present; returns the number removed"""
+        doc_ids = {document["doc_id"] for document in documents}
+        with self._lock, self._conn:
+            for document in documents:
+                self._insert(document, collection)
+            stale = [row["doc_id"] for row in self._conn.execute(
+                "SELECT doc_id FROM documents WHERE collection = ?", (collection,)
+            ) if row["doc_id"] not in doc_ids]
+            self._conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in stale])
+        return len(stale)
+
+    #method: upsert statement (caller holds the lock and transaction)
+    def _insert(self, document: Dict[str, Any], collection: str):
+        self._conn.execute("""
+            INSERT OR REPLACE INTO documents
+            (doc_id, source_file, filename, file_extension, file_size, file_hash, category,
+             collection, total_chunks, ingestion_time, last_modified, text)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            document["doc_id"], document["source_file"], document.get("filename"),
+            document.get("file_extension"), document.get("file_size"), document.get("file_hash"),
+            document.get("category"), collection, document.get("total_chunks"), document.get("ingestion_time"),
+            document.get("last_modified"), document.get("text", "")
+        ))
+
+    #method: get one document record (with full text)
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_documents([doc_id]).get(doc_id)
+
+    #method: get several document records in one query
+    def get_documents(self, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        doc_ids = [doc_id for doc_id in set(doc_ids) if doc_id]
+        if not doc_ids:
+            return {}
+        placeholders = ",".join("?" * len(doc_ids))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM documents WHERE doc_id IN ({placeholders})", doc_ids).fetchall()
+        return {row["doc_id"]: dict(row) for row in rows}
+
+    #method: number of stored documents
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+# Singleton instance
+document_store = DocumentStore()
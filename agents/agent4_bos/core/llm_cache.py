@@ -0,0 +1,144 @@
+#imports
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, Any
+from .metrics import metrics
+
+#function: cache key for one generation request
+def make_cache_key(model: str, prompt: str, temperature: float, num_predict: int) -> Tuple:
+    return (model, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), float(temperature), int(num_predict))
+
+#class: LLMResponseCache - exact-match response cache: in-memory LRU with an optional SQLite tier
+class LLMResponseCache:
+    """
+    get() checks the LRU first, then SQLite (a SQLite hit is promoted back into the LRU).
+    put() writes both tiers. Keys are (model, prompt sha256, temperature, num_predict).
+    The SQLite tier keeps at most sqlite_max_entries rows (least recently used pruned every
+    PRUNE_EVERY puts) and ignores / deletes rows older than ttl_seconds.
+    """
+    PRUNE_EVERY = 100
+
+    def __init__(self, max_entries: int = 512, sqlite_path: Optional[str] = None,
+                 sqlite_max_entries: int = 20000, ttl_seconds: float = 0.0):
+        self.max_entries = max_entries
+        self.sqlite_max_entries = sqlite_max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._puts = 0
+
+        if sqlite_path:
+            os.makedirs(os.path.dirname(sqlite_path), exist_ok=True)
+            self._conn = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            with self._conn:
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        response TEXT,
+                        created_at REAL,
+                        last_used REAL
+                    )
+                """)
+                self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+                self._prune()
+
+    #method: flat string form of a key for the SQLite tier
+    def _db_key(self, key: Tuple) -> str:
+        return "|".join(str(part) for part in key)
+
+    #method: look up a cached response
+    def get(self, key: Tuple) -> Optional[str]:
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                metrics.increment("llm_cache_hits", tier="memory")
+                return self._lru[key]
+
+            if self._conn is not None:
+                db_key = self._db_key(key)
+                row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (db_key,)).fetchone()
+                if row and self._expired(row[1]):
+                    with self._conn:
+                        self._conn.execute("DELETE FROM responses WHERE key = ?", (db_key,))
+                elif row:
+                    with self._conn:
+                        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), db_key))
+                    self._store(key, row[0])
+                    metrics.increment("llm_cache_hits", tier="sqlite")
+                    return row[0]
+
+        metrics.increment("llm_cache_misses")
+        return None
+
+    #method: LRU insert with eviction (caller holds the lock)
+    def _store(self, key: Tuple, response: str):
+        self._lru[key] = response
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            metrics.increment("llm_cache_evictions", tier="memory")
+
+    #method: store a response in both tiers
+    def put(self, key: Tuple, response: str):
+        with self._lock:
+            self._store(key, response)
+            if self._conn is not None:
+                now = time.time()
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                        (self._db_key(key), response, now, now)
+                    )
+                self._puts += 1
+                if self._puts % self.PRUNE_EVERY == 0:
+                    self._prune()
+
+    #method: SQLite row older than the TTL
+    def _expired(self, created_at: Optional[float]) -> bool:
+        return self.ttl_seconds > 0 and (created_at or 0) < time.time() - self.ttl_seconds
+
+    #method: drop expired rows, then the least recently used beyond sqlite_max_entries (caller holds the lock)
+    def _prune(self):
+        with self._conn:
+            removed = 0
+            if self.ttl_seconds > 0:
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                ).rowcount
+            removed += self._conn.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.sqlite_max_entries,)).rowcount
+        if removed:
+            metrics.increment("llm_cache_evictions", removed, tier="sqlite")
+
+    #method: drop every entry from both tiers
+    def clear(self) -> Dict[str, int]:
+        with self._lock:
+            memory = len(self._lru)
+            self._lru.clear()
+            persisted = 0
+            if self._conn is not None:
+                with self._conn:
+                    persisted = self._conn.execute("DELETE FROM responses").rowcount
+        return {"memory": memory, "sqlite": persisted}
+
+    #method: summary for /metrics
+    def get_info(self) -> Dict[str, Any]:
+        hits = metrics.get_counter("llm_cache_hits", tier="memory") + metrics.get_counter("llm_cache_hits", tier="sqlite")
+        misses = metrics.get_counter("llm_cache_misses")
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "sqlite": self._conn is not None,
+            "sqlite_max_entries": self.sqlite_max_entries if self._conn is not None else None,
+            "ttl_seconds": self.ttl_seconds if self._conn is not None else None,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None
+        }
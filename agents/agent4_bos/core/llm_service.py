@@ -1,42 +1,306 @@
+import json
 import time
+import asyncio
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Optional, List, Tuple
+from .single_flight import SingleFlight
+from .llm_cache import LLMResponseCache, make_cache_key
+from .metrics import metrics
+from .deadline import Deadline
+from .ollama_pool import OllamaPool
+from .config import (
+    LLM_MODEL, LLM_BASE_URL, LLM_BASE_URLS, LLM_TASKS, LLM_DEFAULT_TASK, LLM_KEEP_ALIVE,
+    LLM_CACHE_ENABLED, LLM_CACHE_SIZE, LLM_CACHE_SQLITE, LLM_CACHE_PATH, LLM_CACHE_SQLITE_SIZE, LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_TEMPERATURE, LLM_CACHE_HIGH_TEMPERATURE,
+)
+
+# Prefix of the message returned when every attempt failed (callers must not cache such answers)
+LLM_ERROR_PREFIX = "Błąd podczas generowania odpowiedzi"
+
+# Throughput histogram buckets (tokens per second)
+TOKENS_PER_S_BUCKETS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+#class: LLMResult - generated text plus Ollama's timing fields (durations converted from ns to ms)
+class LLMResult:
+    def __init__(self, text: str, task: str, model: str, endpoint: str = None, cached: bool = False,
+                 error: bool = False, timings: Dict[str, Any] = None):
+        timings = timings or {}
+        self.text = text
+        self.task = task
+        self.model = model
+        self.endpoint = endpoint
+        self.cached = cached
+        self.error = error
+        self.total_duration_ms = self._ms(timings.get("total_duration"))
+        self.load_duration_ms = self._ms(timings.get("load_duration"))
+        self.prompt_eval_count = timings.get("prompt_eval_count")
+        self.prompt_eval_duration_ms = self._ms(timings.get("prompt_eval_duration"))
+        self.eval_count = timings.get("eval_count")
+        self.eval_duration_ms = self._ms(timings.get("eval_duration"))
+
+    #method: nanoseconds -> milliseconds
+    @staticmethod
+    def _ms(value) -> Optional[float]:
+        return value / 1e6 if value is not None else None
+
+    #method: tokens per second for a count / duration pair (None if not reported)
+    @staticmethod
+    def _rate(count, duration_ms) -> Optional[float]:
+        return count / (duration_ms / 1000) if count and duration_ms else None
+
+    #property: prefill throughput (prompt tokens evaluated per second)
+    @property
+    def prefill_tokens_per_s(self) -> Optional[float]:
+        return self._rate(self.prompt_eval_count, self.prompt_eval_duration_ms)
+
+    #property: decode throughput (generated tokens per second)
+    @property
+    def decode_tokens_per_s(self) -> Optional[float]:
+        return self._rate(self.eval_count, self.eval_duration_ms)
+
+    #method: summary attached to responses
+    def to_dict(self) -> Dict[str, Any]:
+        def rounded(value):
+            return round(value, 1) if value is not None else None
+        return {
+            "task": self.task,
+            "model": self.model,
+            "endpoint": self.endpoint,
+            "cached": self.cached,
+            "error": self.error,
+            "total_duration_ms": rounded(self.total_duration_ms),
+            "load_duration_ms": rounded(self.load_duration_ms),
+            "prompt_eval_count": self.prompt_eval_count,
+            "prompt_eval_duration_ms": rounded(self.prompt_eval_duration_ms),
+            "eval_count": self.eval_count,
+            "eval_duration_ms": rounded(self.eval_duration_ms),
+            "prefill_tokens_per_s": rounded(self.prefill_tokens_per_s),
+            "decode_tokens_per_s": rounded(self.decode_tokens_per_s)
+        }
+
+    def __str__(self) -> str:
+        return self.text
+
 
 #class: LLMService - handles interactions with the LLM using API 
 class LLMService:
-    def __init__(self, model="llama3", base_url="http://ollama:11434"):
+    def __init__(self, model=LLM_MODEL, base_url=LLM_BASE_URL, cache: Optional[LLMResponseCache] = None,
+                 tasks: Dict[str, Dict[str, Any]] = None, base_urls: List[str] = None):
         self.model_name = model
         self.base_url = base_url
+        # Endpoint pool (LLM_BASE_URLS); a single URL behaves like the plain base_url
+        self.pool = OllamaPool(base_urls or (LLM_BASE_URLS if base_url == LLM_BASE_URL else [base_url]))
+        self.cache = cache
+        self.tasks = tasks if tasks is not None else LLM_TASKS
+        
+        # Last num_ctx sent per model - reused by calls without one, since a num_ctx change reloads
+        # the model in Ollama and throws away its prompt (KV) cache
+        self._num_ctx = {}
+        
+        # Identical concurrent generations (same model, prompt and options) share one Ollama call
+        self._flight = SingleFlight("llm")
+    
+    #method: model, options and timeout for a task type (unknown tasks use the default task)
+    def route(self, task: str = LLM_DEFAULT_TASK) -> Dict[str, Any]:
+        route = self.tasks.get(task) or self.tasks[LLM_DEFAULT_TASK]
+        return {
+            "model": route.get("model") or self.model_name,
+            "options": dict(route.get("options", {})),
+            "timeout": route.get("timeout")
+        }
+    
+    #method: generate response text (see generate_result for timings)
+    def generate_response(self, prompt: str, **kwargs) -> str:
+        """Generate LLM response text; arguments as in generate_result"""
+        return self.generate_result(prompt, **kwargs).text
+    
+    #method: generate response with Ollama timings
+    def generate_result(self, prompt: str, temperature: float = None, max_tokens: int = None, max_retries: int = 3,
+                        num_ctx: int = None, task: str = LLM_DEFAULT_TASK, system: str = None,
+                        format: Dict[str, Any] = None, deadline: Deadline = None) -> LLMResult:
+        """
+        Generate LLM response with retry logic using the Ollama chat API
+        task: classify / suggest / answer / generate_document - selects model, options and timeout;
+        explicit temperature / max_tokens override the task options (num_ctx=None reuses the model's last num_ctx)
+        system: fixed instruction prefix sent as the system message - keep it identical between calls
+        and put the variable content in prompt, so Ollama can reuse the cached prefix
+        format: JSON schema the output is constrained to (Ollama structured output), see generate_json
+        deadline: request budget - caps the HTTP timeout and stops retrying once it runs out
+        Returns LLMResult (text, model, endpoint, Ollama durations and token counts; cached hits carry no timings)
+        """
+        route = self.route(task)
+        model = route["model"]
+        options = route["options"]
+        if temperature is not None:
+            options["temperature"] = temperature
+        if max_tokens is not None:
+            options["num_predict"] = max_tokens
+        if num_ctx:
+            self._num_ctx[model] = num_ctx
+        if model in self._num_ctx:
+            options["num_ctx"] = self._num_ctx[model]
+        temperature = options.get("temperature", 0.1)
+        messages = ([{"role": "system", "content": system}] if system else []) + [{"role": "user", "content": prompt}]
+        schema = json.dumps(format, sort_keys=True) if format else ""
+        cache_prompt = f"{system or ''}\x00{prompt}\x00{schema}"
+        key = make_cache_key(model, cache_prompt, temperature, options.get("num_predict", -1))
+        
+        # Exact-match cache; high-temperature calls want varied output and bypass it unless explicitly enabled
+        cacheable = self.cache is not None and (temperature <= LLM_CACHE_MAX_TEMPERATURE or LLM_CACHE_HIGH_TEMPERATURE)
+        if cacheable:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return LLMResult(cached, task, model, cached=True)
+        
+        result = self._flight.run(key, lambda: self._generate(messages, model, options, route["timeout"], max_retries, task, format, deadline))
+        
+        if cacheable and not result.error:
+            # A fallback-model answer is stored under the model that produced it, not the task model
+            if result.model != model:
+                key = make_cache_key(result.model, cache_prompt, temperature, options.get("num_predict", -1))
+            self.cache.put(key, result.text)
+        return result
     
-    #method: generate response
-    def generate_response(self, prompt: str, temperature: float = 0.1, max_tokens: int = 2000, max_retries: int = 3) -> str:
-        """Generate LLM response with retry logic using direct Ollama API"""
+    #method: one Ollama generation with retries (a failing task model falls back to the default model,
+    #        a failing endpoint to another endpoint of the pool)
+    def _generate(self, messages: List[Dict[str, str]], model: str, options: Dict[str, Any], timeout: float,
+                  max_retries: int, task: str, format: Dict[str, Any] = None, deadline: Deadline = None) -> LLMResult:
+        tried = set()
         for attempt in range(max_retries):
+            if deadline is not None:
+                if not deadline.allows(f"llm_{task}"):
+                    return LLMResult(f"{LLM_ERROR_PREFIX}: request deadline exceeded", task, model, error=True)
+                timeout = min(timeout or deadline.remaining_s(), deadline.remaining_s())
+            endpoint = self.pool.acquire(model, exclude=tried)
+            tried.add(endpoint.url)
             try:
-                url = f"{self.base_url}/api/generate"
+                url = f"{endpoint.url}/api/chat"
                 payload = {
-                    "model": self.model_name,
-                    "prompt": prompt,
+                    "model": model,
+                    "messages": messages,
                     "stream": False,
-                    "options": {
-                        "temperature": temperature,
-                        "num_predict": max_tokens
-                    }
+                    "keep_alive": LLM_KEEP_ALIVE,
+                    "options": options
                 }
+                if format:
+                    payload["format"] = format
                 
-                response = requests.post(url, json=payload)
+                start = time.perf_counter()
+                response = requests.post(url, json=payload, timeout=timeout)
                 response.raise_for_status()
                 
                 result = response.json()
-                return result.get("response", "")
+                latency_ms = (time.perf_counter() - start) * 1000
+                self.pool.release(endpoint, model, latency_ms)
+                metrics.observe("llm_latency_ms", latency_ms, task=task, model=model)
+                llm_result = LLMResult(result.get("message", {}).get("content", ""), task, model,
+                                       endpoint=endpoint.url, timings=result)
+                self._observe_usage(llm_result)
+                return llm_result
                 
             except Exception as e:
+                self.pool.release(endpoint, model, ok=False)
+                metrics.increment("llm_errors", task=task, model=model)
+                if model != self.model_name and attempt < max_retries - 1:
+                    print(f"LLM model {model} failed for task '{task}' ({e}) - falling back to {self.model_name}")
+                    metrics.increment("llm_model_fallbacks", task=task)
+                    model = self.model_name
+                    continue
+                if deadline is not None and deadline.remaining_s() <= 2 ** attempt:
+                    print(f"LLM call for task '{task}' failed and the request deadline leaves no time to retry: {e}")
+                    return LLMResult(f"{LLM_ERROR_PREFIX}: {str(e)}", task, model, error=True)
                 if attempt < max_retries - 1:
                     print(f"LLM attempt {attempt + 1} failed: {str(e)}")
                     time.sleep(2 ** attempt)
                 else:
                     print(f"Failed after {max_retries} attempts: {str(e)}")
-                    return f"Błąd podczas generowania odpowiedzi: {str(e)}"
+                    return LLMResult(f"{LLM_ERROR_PREFIX}: {str(e)}", task, model, error=True)
+    
+    #method: timing histograms per task and model - shows whether slowness is prompt size, model loading or decode speed
+    def _observe_usage(self, result: LLMResult):
+        """With a reused prefix Ollama evaluates (and reports) only the new prompt tokens"""
+        labels = {"task": result.task, "model": result.model}
+        tokens = (16, 64, 256, 512, 1024, 2048, 4096, 8192)
+        if result.total_duration_ms is not None:
+            metrics.observe("llm_total_ms", result.total_duration_ms, **labels)
+        if result.load_duration_ms is not None:
+            metrics.observe("llm_load_ms", result.load_duration_ms, **labels)
+        if result.prompt_eval_duration_ms is not None:
+            metrics.observe("llm_prompt_eval_ms", result.prompt_eval_duration_ms, **labels)
+        if result.prompt_eval_count is not None:
+            metrics.observe("llm_prompt_eval_tokens", result.prompt_eval_count, buckets=tokens, **labels)
+        if result.eval_count is not None:
+            metrics.observe("llm_eval_tokens", result.eval_count, buckets=tokens, **labels)
+            metrics.increment("llm_eval_tokens_total", result.eval_count, **labels)
+        if result.prefill_tokens_per_s is not None:
+            metrics.observe("llm_prefill_tokens_per_s", result.prefill_tokens_per_s, buckets=TOKENS_PER_S_BUCKETS, **labels)
+        if result.decode_tokens_per_s is not None:
+            metrics.observe("llm_decode_tokens_per_s", result.decode_tokens_per_s, buckets=TOKENS_PER_S_BUCKETS, **labels)
+    
+    #method: generate a JSON object constrained by a schema
+    def generate_json(self, prompt: str, schema: Dict[str, Any], task: str, system: str = None,
+                      **kwargs) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Returns (parsed object, raw response). The object is None when the call failed or the output
+        does not parse / lacks a required field (counted in llm_parse_failures - e.g. num_predict too tight)
+        """
+        response = self.generate_response(prompt, task=task, system=system, format=schema, **kwargs)
+        if response.startswith(LLM_ERROR_PREFIX):
+            return None, response
+        try:
+            parsed = json.loads(response)
+            if not isinstance(parsed, dict) or any(field not in parsed for field in schema.get("required", [])):
+                raise ValueError("missing required fields")
+            return parsed, response
+        except ValueError as e:
+            print(f"LLM JSON output for task '{task}' could not be parsed: {e}")
+            metrics.increment("llm_parse_failures", task=task)
+            return None, response
+    
+    #method: distinct models used by the configured tasks (default model first)
+    def models(self) -> List[str]:
+        models = [self.model_name]
+        for task in self.tasks:
+            model = self.route(task)["model"]
+            if model not in models:
+                models.append(model)
+        return models
+    
+    #method: load a model into Ollama memory without generating (empty prompt) and pin it with keep_alive
+    def preload(self, model: str, keep_alive: str = LLM_KEEP_ALIVE, timeout: float = 600) -> float:
+        """
+        Loads the model on every pool endpoint. Returns the slowest call duration in ms
+        (≈ model load time when the model was not resident); raises only if no endpoint succeeded
+        """
+        durations, errors = [], []
+        for endpoint in self.pool.endpoints:
+            start = time.perf_counter()
+            try:
+                response = requests.post(
+                    f"{endpoint.url}/api/generate",
+                    json={"model": model, "prompt": "", "stream": False, "keep_alive": keep_alive},
+                    timeout=timeout
+                )
+                response.raise_for_status()
+                endpoint.loaded_models.add(model)
+                durations.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors.append(f"{endpoint.url}: {e}")
+        if not durations:
+            raise RuntimeError("; ".join(errors))
+        if errors:
+            print(f"Preload of {model} failed on: {'; '.join(errors)}")
+        return max(durations)
+    
+    #method: generate response from async code (runs the blocking HTTP call in a worker thread)
+    async def agenerate_response(self, prompt: str, **kwargs) -> str:
+        """Async wrapper around generate_response for FastAPI handlers"""
+        return await asyncio.to_thread(self.generate_response, prompt, **kwargs)
+    
+    #method: generate_result from async code
+    async def agenerate_result(self, prompt: str, **kwargs) -> LLMResult:
+        """Async wrapper around generate_result for FastAPI handlers"""
+        return await asyncio.to_thread(self.generate_result, prompt, **kwargs)
     
     #method: get LLM service information
     def get_info(self) -> Dict[str, Any]:
@@ -44,9 +308,16 @@ class LLMService:
         return {
             "model": self.model_name,
             "base_url": self.base_url,
-            "service": "Ollama Direct API"
+            "endpoints": self.pool.get_info(),
+            "tasks": {task: self.route(task) for task in self.tasks},
+            "service": "Ollama Direct API",
+            "cache": self.cache.get_info() if self.cache else None
         }
 
 
 # Singleton instance
-llm_service = LLMService()
\ No newline at end of file
+llm_service = LLMService(
+    cache=LLMResponseCache(
+        LLM_CACHE_SIZE, LLM_CACHE_PATH if LLM_CACHE_SQLITE else None, LLM_CACHE_SQLITE_SIZE, LLM_CACHE_TTL_SECONDS
+    ) if LLM_CACHE_ENABLED else None
+)
\ No newline at end of file
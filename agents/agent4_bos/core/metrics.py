@@ -0,0 +1,102 @@
+#imports
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple
+
+# Default histogram buckets (milliseconds)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+#class: Metrics - in-process counters and histograms (exposed by GET /metrics)
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    #method: build a hashable key from metric name and labels
+    def _key(self, name: str, labels: Dict[str, Any]) -> Tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    #method: increase a counter
+    def increment(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    #method: record one observation in a histogram
+    def observe(self, name: str, value: float, buckets: Tuple = LATENCY_BUCKETS_MS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "min": value,
+                    "max": value,
+                    "buckets": {bound: 0 for bound in buckets},
+                    "overflow": 0
+                }
+                self._histograms[key] = histogram
+
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["min"] = min(histogram["min"], value)
+            histogram["max"] = max(histogram["max"], value)
+            for bound in histogram["buckets"]:
+                if value <= bound:
+                    histogram["buckets"][bound] += 1
+                    break
+            else:
+                histogram["overflow"] += 1
+
+    #method: time a block of code in milliseconds
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000, **labels)
+
+    #method: read a single counter value
+    def get_counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    #method: JSON-friendly view of all metrics
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+
+            histograms = {}
+            for (name, labels), histogram in self._histograms.items():
+                # Cumulative bucket counts ("le" = less or equal)
+                cumulative, running = {}, 0
+                for bound, count in histogram["buckets"].items():
+                    running += count
+                    cumulative[f"le_{bound}"] = running
+                histograms.setdefault(name, []).append({
+                    "labels": dict(labels),
+                    "count": histogram["count"],
+                    "avg": round(histogram["sum"] / histogram["count"], 2),
+                    "min": round(histogram["min"], 2),
+                    "max": round(histogram["max"], 2),
+                    "buckets": cumulative,
+                    "overflow": histogram["overflow"]
+                })
+
+        return {"counters": counters, "histograms": histograms}
+
+    #method: drop all recorded values
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Singleton instance
+metrics = Metrics()
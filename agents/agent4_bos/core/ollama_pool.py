@@ -0,0 +1,125 @@
+#imports
+import time
+import threading
+import requests
+from typing import List, Dict, Any, Optional, Set
+from .config import (
+    LLM_BASE_URLS, OLLAMA_POOL_EWMA_ALPHA, OLLAMA_POOL_EJECT_AFTER, OLLAMA_POOL_EJECT_SECONDS, OLLAMA_POOL_PS_TTL,
+    OLLAMA_POOL_COLD_PENALTY,
+)
+from .metrics import metrics
+
+#class: OllamaEndpoint - one Ollama backend with its load, latency and health state
+class OllamaEndpoint:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.ewma_ms = None
+        self.failures = 0  # consecutive
+        self.ejected_until = 0.0
+        self.loaded_models = set()
+        self.loaded_checked = 0.0
+
+    #method: ejected after repeated failures (re-admitted when the ejection expires)
+    def ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    #method: state for /metrics
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "failures": self.failures,
+            "ejected": self.ejected(time.time()),
+            "loaded_models": sorted(self.loaded_models)
+        }
+
+
+#class: OllamaPool - picks an Ollama endpoint per call: least outstanding x latency EWMA, cold endpoints penalized
+class OllamaPool:
+    """
+    Health is tracked passively from real calls: OLLAMA_POOL_EJECT_AFTER consecutive failures eject an endpoint
+    for OLLAMA_POOL_EJECT_SECONDS. Loaded models come from /api/ps (refreshed in the background after
+    OLLAMA_POOL_PS_TTL seconds) and from successful calls; an endpoint without the model scores
+    OLLAMA_POOL_COLD_PENALTY times worse, so requests prefer resident models but still spread when a warm endpoint is busy.
+    """
+    def __init__(self, urls: List[str] = None, ewma_alpha: float = OLLAMA_POOL_EWMA_ALPHA,
+                 eject_after: int = OLLAMA_POOL_EJECT_AFTER, eject_seconds: float = OLLAMA_POOL_EJECT_SECONDS,
+                 ps_ttl: float = OLLAMA_POOL_PS_TTL, cold_penalty: float = OLLAMA_POOL_COLD_PENALTY):
+        self.endpoints = [OllamaEndpoint(url) for url in (urls or LLM_BASE_URLS)]
+        self.ewma_alpha = ewma_alpha
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.ps_ttl = ps_ttl
+        self.cold_penalty = cold_penalty
+        self._lock = threading.Lock()
+
+    #method: refresh loaded models of one endpoint from /api/ps
+    def refresh_loaded(self, endpoint: OllamaEndpoint, timeout: float = 1.0):
+        endpoint.loaded_checked = time.time()  # set first so concurrent callers do not all refresh
+        try:
+            response = requests.get(f"{endpoint.url}/api/ps", timeout=timeout)
+            response.raise_for_status()
+            models = {model.get("name") for model in response.json().get("models", [])}
+            # "llama3" is reported as "llama3:latest"
+            with self._lock:
+                endpoint.loaded_models = models | {name.split(":")[0] for name in models if name.endswith(":latest")}
+        except Exception as e:
+            print(f"Ollama pool: /api/ps failed for {endpoint.url}: {e}")
+
+    #method: choose an endpoint for a model and count the request as outstanding
+    def acquire(self, model: str, exclude: Set[str] = None) -> OllamaEndpoint:
+        """exclude: endpoints already tried by this call (retries go elsewhere when possible)"""
+        now = time.time()
+        if len(self.endpoints) > 1:
+            for endpoint in self.endpoints:
+                if now - endpoint.loaded_checked > self.ps_ttl:
+                    # Refresh off the request path - this call uses the loaded models known so far
+                    endpoint.loaded_checked = now
+                    threading.Thread(target=self.refresh_loaded, args=(endpoint,), daemon=True).start()
+
+        with self._lock:
+            candidates = [e for e in self.endpoints if not e.ejected(now) and e.url not in (exclude or ())]
+            if not candidates:
+                # Everything ejected or tried - take the endpoint whose ejection ends first
+                candidates = [min(self.endpoints, key=lambda e: e.ejected_until)]
+
+            known = [e.ewma_ms for e in candidates if e.ewma_ms is not None]
+            default_ms = min(known) if known else 1.0  # unmeasured endpoints look like the fastest one, so they get tried
+            endpoint = min(candidates, key=lambda e: self._score(e, model, default_ms))
+            endpoint.outstanding += 1
+            warm = model in endpoint.loaded_models
+
+        metrics.increment("ollama_pool_requests", endpoint=endpoint.url, warm=warm)
+        return endpoint
+
+    #method: expected cost of sending one more request to an endpoint (lower is better)
+    def _score(self, endpoint: OllamaEndpoint, model: str, default_ms: float) -> float:
+        latency_ms = endpoint.ewma_ms if endpoint.ewma_ms is not None else default_ms
+        penalty = 1.0 if model in endpoint.loaded_models else self.cold_penalty
+        return (endpoint.outstanding + 1) * latency_ms * penalty
+
+    #method: finish a request - update latency EWMA or failure count (ejecting after repeated failures)
+    def release(self, endpoint: OllamaEndpoint, model: str, latency_ms: Optional[float] = None, ok: bool = True):
+        with self._lock:
+            endpoint.outstanding = max(endpoint.outstanding - 1, 0)
+            if ok:
+                endpoint.failures = 0
+                endpoint.loaded_models.add(model)
+                if latency_ms is not None:
+                    endpoint.ewma_ms = latency_ms if endpoint.ewma_ms is None else \
+                        self.ewma_alpha * latency_ms + (1 - self.ewma_alpha) * endpoint.ewma_ms
+                return
+
+            endpoint.failures += 1
+            if endpoint.failures >= self.eject_after and len(self.endpoints) > 1:
+                endpoint.ejected_until = time.time() + self.eject_seconds
+                endpoint.failures = 0
+                endpoint.loaded_models.clear()
+                print(f"Ollama pool: ejecting {endpoint.url} for {self.eject_seconds:g} s")
+                metrics.increment("ollama_pool_ejections", endpoint=endpoint.url)
+
+    #method: pool state for /metrics
+    def get_info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {endpoint.url: endpoint.get_info() for endpoint in self.endpoints}
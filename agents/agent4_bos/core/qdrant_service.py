@@ -1,19 +1,83 @@
 #imports
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter
+import re
+import time
+import asyncio
+import datetime
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, SearchRequest,
+    PayloadSelectorInclude, PayloadSelectorExclude,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation,
+    SparseVectorParams, SparseVector, NamedSparseVector, Modifier,
+)
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union, Iterator, AsyncIterator
 from .config import (
     QDRANT_HOST, QDRANT_PORT, 
     SPECIAL_CASES_COLLECTION, 
     KNOWLEDGE_BASE_COLLECTION,
+    EMBEDDING_WORKERS,
+    ALL_CATEGORIES_KEY,
+    SCROLL_PAGE_SIZE,
+    STATS_TTL_SECONDS,
+    KNOWLEDGE_BASE_CATEGORIES,
+    COLLECTION_VERSIONS_TO_KEEP,
+    SPARSE_VECTOR_NAME,
+    RRF_K,
+    VECTOR_MIRROR_ENABLED,
 )
+from .sparse_encoder import sparse_encoder
+from .metrics import metrics
+
+# Payload projections - fetch only the fields each code path needs
+CHUNK_PAYLOAD_FIELDS = [
+    "text",
+    "metadata.doc_id",
+    "metadata.category",
+    "metadata.chunk_index",
+    # Legacy points (ingested before the document store) still carry these
+    "metadata.source_file",
+    "metadata.filename",
+    "metadata.total_chunks",
+]
+CASE_PAYLOAD_FIELDS = CHUNK_PAYLOAD_FIELDS + [
+    "case_id", "title", "author", "created_at", "description", "solution", "additional_notes",
+]
+CASE_SUMMARY_FIELDS = ["case_id", "title", "author", "created_at"]
+
+# Default projection per collection key (used when a call does not pass its own selector)
+DEFAULT_PAYLOAD_FIELDS = {
+    "knowledge_base": CHUNK_PAYLOAD_FIELDS,
+    "special_cases": CASE_PAYLOAD_FIELDS,
+}
 
 # QdrantService class: Manages all interactions with Qdrant, including collection management, saving cases, and searching
 class QdrantService:
     def __init__(self, host=QDRANT_HOST, port=QDRANT_PORT):
         self.client = QdrantClient(host=host, port=port)
+        self.async_client = AsyncQdrantClient(host=host, port=port)
         self.embedder = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+        
+        # Dedicated executor for embeddings requested from async code
+        self.embed_executor = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedder")
+        
+        # Cached collection stats view (see get_stats)
+        self.index_generation = 0
+        self.last_ingestion_time = None
+        self._stats = None
+        self._stats_lock = threading.Lock()
+        
+        # collection name -> has the sparse (BM25) vector; older versions may not
+        self._sparse_support = {}
+        
+        # Optional in-process mirror of the served collections (brute-force search, Qdrant fallback)
+        self.vector_mirror = None
+        if VECTOR_MIRROR_ENABLED:
+            from .vector_mirror import vector_mirror
+            self.vector_mirror = vector_mirror
 
         # Collections
         self.collections = {
@@ -25,20 +89,197 @@ class QdrantService:
 
     # method: ensure collections exist
     def _ensure_collections(self):
-        """Create collections if they don't exist"""
-        for collection_name in self.collections.values():
+        """Make sure every alias resolves to a collection (creates <alias>_v1 if nothing exists yet)"""
+        try:
+            existing = self._collection_names()
+            aliases = self._get_aliases()
+        except Exception as e:
+            print(f"Error listing collections: {e}")
+            return
+        
+        for collection_key, alias in self.collections.items():
+            # Alias already set up, or a legacy unversioned collection (migrated on first reindex)
+            if alias in aliases or alias in existing:
+                continue
             try:
-                collections = self.client.get_collections().collections
-                collection_names = [c.name for c in collections]
-                
-                if collection_name not in collection_names:
-                    self.client.create_collection(
-                        collection_name=collection_name,
-                        vectors_config=VectorParams(size=384, distance=Distance.COSINE)
-                    )
-                    print(f"Created collection: {collection_name}")
+                physical_name = self.create_versioned_collection(collection_key)
+                self.swap_alias(collection_key, physical_name)
+                print(f"Created collection: {physical_name} (alias: {alias})")
+            except Exception as e:
+                print(f"Error ensuring collection {alias}: {e}")
+    
+    # VERSIONED COLLECTIONS - aliases make a full reindex invisible to readers
+    
+    #method: names of all physical collections
+    def _collection_names(self) -> set:
+        return {c.name for c in self.client.get_collections().collections}
+    
+    #method: alias -> collection mapping
+    def _get_aliases(self) -> Dict[str, str]:
+        return {a.alias_name: a.collection_name for a in self.client.get_aliases().aliases}
+    
+    #method: list versioned collections behind an alias, oldest first
+    def _versions(self, collection: str) -> List[Tuple[int, str]]:
+        pattern = re.compile(rf"^{re.escape(self.collections[collection])}_v(\d+)$")
+        versions = []
+        for name in self._collection_names():
+            match = pattern.match(name)
+            if match:
+                versions.append((int(match.group(1)), name))
+        return sorted(versions)
+    
+    #method: physical collection currently served under the alias
+    def resolve_collection(self, collection: str) -> Optional[str]:
+        alias = self.collections.get(collection)
+        if not alias:
+            return None
+        aliases = self._get_aliases()
+        if alias in aliases:
+            return aliases[alias]
+        return alias if alias in self._collection_names() else None
+    
+    #method: create the next versioned collection for a key (not served until swap_alias)
+    def create_versioned_collection(self, collection: str) -> str:
+        versions = self._versions(collection)
+        next_version = versions[-1][0] + 1 if versions else 1
+        physical_name = f"{self.collections[collection]}_v{next_version}"
+        self.client.create_collection(
+            collection_name=physical_name,
+            vectors_config=VectorParams(size=384, distance=Distance.COSINE),
+            sparse_vectors_config={SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)}
+        )
+        return physical_name
+    
+    #method: atomically point the alias at another collection
+    def swap_alias(self, collection: str, physical_name: str):
+        alias = self.collections[collection]
+        
+        # Legacy unversioned collection occupies the alias name - must be dropped first (one-time migration)
+        if alias in self._collection_names():
+            print(f"Migrating legacy collection {alias} to alias -> {physical_name}")
+            self.client.delete_collection(alias)
+        
+        operations = []
+        if alias in self._get_aliases():
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+        operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=physical_name, alias_name=alias)))
+        
+        # Both operations are applied in one request
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        self._sparse_support.pop(alias, None)
+        self.mark_index_changed()
+        self._mirror_reset(collection)
+        print(f"Alias {alias} -> {physical_name}")
+    
+    #method: delete versions that are no longer served
+    def gc_collection_versions(self, collection: str, keep: int = COLLECTION_VERSIONS_TO_KEEP) -> List[str]:
+        """Drop old versions behind the alias, keeping the newest `keep` non-serving ones"""
+        serving = self.resolve_collection(collection)
+        stale = [name for _, name in self._versions(collection) if name != serving]
+        to_delete = stale[:len(stale) - keep] if keep else stale
+        
+        for name in to_delete:
+            try:
+                self.client.delete_collection(name)
+                print(f"Deleted old collection version: {name}")
             except Exception as e:
-                print(f"Error ensuring collection {collection_name}: {e}")
+                print(f"Error deleting {name}: {e}")
+        return to_delete
+    
+    #method: drop a collection version that failed validation
+    def drop_collection_version(self, physical_name: str):
+        if physical_name in self._get_aliases().values():
+            print(f"Refusing to drop serving collection {physical_name}")
+            return
+        self.client.delete_collection(physical_name)
+    
+    #method: exact point count of a physical collection
+    def count_points(self, physical_name: str) -> int:
+        return self.client.count(collection_name=physical_name, exact=True).count
+    
+    # SPARSE VECTORS - BM25-style lexical vector stored next to the dense one
+    
+    #method: check (cached) whether a collection has the sparse vector configured
+    def has_sparse(self, collection_name: str) -> bool:
+        if collection_name not in self._sparse_support:
+            try:
+                physical_name = self._get_aliases().get(collection_name, collection_name)
+                params = self.client.get_collection(physical_name).config.params
+                self._sparse_support[collection_name] = SPARSE_VECTOR_NAME in (params.sparse_vectors or {})
+            except Exception as e:
+                print(f"Error reading config of {collection_name}: {e}")
+                return False
+        return self._sparse_support[collection_name]
+    
+    #method: async check whether a collection has the sparse vector configured
+    async def ahas_sparse(self, collection_name: str) -> bool:
+        if collection_name not in self._sparse_support:
+            try:
+                aliases = {a.alias_name: a.collection_name for a in (await self.async_client.get_aliases()).aliases}
+                params = (await self.async_client.get_collection(aliases.get(collection_name, collection_name))).config.params
+                self._sparse_support[collection_name] = SPARSE_VECTOR_NAME in (params.sparse_vectors or {})
+            except Exception as e:
+                print(f"Error reading config of {collection_name}: {e}")
+                return False
+        return self._sparse_support[collection_name]
+    
+    #method: point vector(s) for a text - dense only, or dense + sparse when the collection supports it
+    def _point_vector(self, text: str, embedding: List[float], with_sparse: bool):
+        if not with_sparse:
+            return embedding
+        return {"": embedding, SPARSE_VECTOR_NAME: SparseVector(**sparse_encoder.encode_document(text))}
+    
+    #method: reciprocal rank fusion of several ranked hit lists
+    @staticmethod
+    def fuse_rrf(result_lists: List[List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+        """Sum 1 / (k + rank) per point over all lists; the first list's dict wins for duplicates"""
+        fused = {}
+        for results in result_lists:
+            for rank, result in enumerate(results, 1):
+                entry = fused.setdefault(result["id"], result)
+                entry["rrf_score"] = entry.get("rrf_score", 0.0) + 1.0 / (k + rank)
+        return sorted(fused.values(), key=lambda x: x["rrf_score"], reverse=True)
+    
+    #method: fuse dense and sparse legs of a hybrid sub-query
+    def _fuse_hybrid(self, dense: List[Dict[str, Any]], sparse: List[Dict[str, Any]], query_embedding: List[float], limit: int) -> List[Dict[str, Any]]:
+        """
+        RRF-fused hits. "score" stays a cosine similarity for every hit, so confidence
+        thresholds keep their meaning: lexical-only hits get it computed from their returned vector.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        dense_ids = {result["id"] for result in dense}
+        
+        for result in sparse:
+            vector = result.pop("vector", None)
+            result["lexical_score"] = result["score"]
+            if result["id"] in dense_ids:
+                continue
+            if isinstance(vector, dict):
+                vector = vector.get("")
+            if vector is None:
+                result["score"] = 0.0
+                continue
+            stored = np.asarray(vector, dtype=np.float32)
+            result["score"] = float(stored @ query / (np.linalg.norm(stored) or 1.0))
+        
+        return self.fuse_rrf([dense, sparse])[:limit]
+    
+    #method: build a payload selector for one call
+    def _payload_selector(self, collection: str, include: Union[List[str], bool, None] = None, exclude: List[str] = None):
+        """
+        include=None  -> default projection for the collection
+        include=True  -> full payload
+        include=[...] -> only these (dotted) fields
+        exclude=[...] -> everything except these fields
+        """
+        if exclude is not None:
+            return PayloadSelectorExclude(exclude=exclude)
+        if include is None:
+            include = DEFAULT_PAYLOAD_FIELDS.get(collection, True)
+        if include is True:
+            return True
+        return PayloadSelectorInclude(include=include)
     
     #method: clear collections (delete and recreate or clear contents)
     def clear_all_collections(self, delete_structure: bool = False):
@@ -46,7 +287,7 @@ class QdrantService:
         Clear collections.
         
         Args:
-            delete_structure: If True, deletes and recreates collections
+            delete_structure: If True, swaps each alias to a fresh empty version
                              If False (default), only clears content
         """
         print("=" * 60)
@@ -59,24 +300,24 @@ class QdrantService:
         for collection_key, collection_name in self.collections.items():
             try:
                 if delete_structure:
-                    # Delete and recreate collections
-                    self.client.delete_collection(collection_name)
-                    self.client.create_collection(
-                        collection_name=collection_name,
-                        vectors_config=VectorParams(size=384, distance=Distance.COSINE)
-                    )
-                    print(f"  Recreated: {collection_name}")
+                    # Point the alias at a new empty version and drop the old ones
+                    physical_name = self.create_versioned_collection(collection_key)
+                    self.swap_alias(collection_key, physical_name)
+                    self.gc_collection_versions(collection_key, keep=0)
+                    print(f"  Recreated: {collection_name} -> {physical_name}")
                 else:
                     # Only clear content
                     self.client.delete(
                         collection_name=collection_name,
                         points_selector=Filter(must=[]) 
                     )
+                    self._mirror_reset(collection_key)
                     print(f"Cleared: {collection_name} (structure kept)")
                     
             except Exception as e:
                 print(f"  Error with {collection_name}: {e}")
         
+        self.mark_index_changed()
         print("Operation completed")
     
     #method: clear collection contents (keep structure)
@@ -93,13 +334,16 @@ class QdrantService:
                 points_selector=Filter(must=[])
             )
             print(f"Cleared contents of {collection_name} (structure preserved)")
+            self.mark_index_changed()
+            self._mirror_reset(collection)
             return True
         except Exception as e:
             print(f"Error: {e}")
             return False
     
     #method: search all documents in a category
-    def search_all_in_category(self, query: str, category: str, collection: str = "knowledge_base") -> List[Dict[str, Any]]:
+    def search_all_in_category(self, query: str, category: str, collection: str = "knowledge_base",
+                               payload_include: Union[List[str], bool, None] = None, payload_exclude: List[str] = None) -> List[Dict[str, Any]]:
         """
         Search ALL documents in a specific category (no limit)
         """
@@ -140,7 +384,9 @@ class QdrantService:
                 collection_name=collection_name,
                 query_vector=query_embedding,
                 query_filter=search_filter,
-                limit=total_in_category 
+                limit=total_in_category,
+                with_payload=self._payload_selector(collection, payload_include, payload_exclude),
+                with_vectors=False
             )
             
             # Format results
@@ -185,6 +431,8 @@ class QdrantService:
                     collection_name=collection_name,
                     query_vector=self.embedder.encode(content_to_hash).tolist(),
                     limit=3,
+                    with_payload=PayloadSelectorInclude(include=["title", "case_id"]),
+                    with_vectors=False,
                     query_filter=Filter(
                         should=[
                             FieldCondition(
@@ -243,7 +491,7 @@ class QdrantService:
             # Create point
             point = PointStruct(
                 id=point_id,
-                vector=embedding,
+                vector=self._point_vector(text_for_embedding, embedding, self.has_sparse(collection_name)),
                 payload=payload
             )
             
@@ -253,6 +501,8 @@ class QdrantService:
                 points=[point]
             )
             
+            self._mirror_upsert(collection, [(point_id, embedding, payload)])
+            self.mark_index_changed(ingested=True)
             print(f"Case saved to Qdrant: {case_id}")
             print(f"Title: {case_data.get('title', '')[:50]}...")
             print(f"Content hash: {content_hash[:8]}")
@@ -272,9 +522,9 @@ class QdrantService:
                 "message": f"Błąd zapisu do Qdrant: {str(e)}"
             }
     #method: save document chunk (for knowledge base)
-    def save_document_chunk(self, chunk_data: Dict[str, Any], collection: str = "knowledge_base"):
-        """Save a document chunk to Qdrant"""
-        collection_name = self.collections.get(collection, KNOWLEDGE_BASE_COLLECTION)
+    def save_document_chunk(self, chunk_data: Dict[str, Any], collection: str = "knowledge_base", collection_name: str = None):
+        """Save a document chunk to Qdrant (collection_name overrides the alias, e.g. during a reindex)"""
+        collection_name = collection_name or self.collections.get(collection, KNOWLEDGE_BASE_COLLECTION)
         
         # Ensure ID is a string
         point_id = str(chunk_data["id"])
@@ -282,11 +532,11 @@ class QdrantService:
         # Generate embedding
         embedding = self.embedder.encode(chunk_data["text"]).tolist()
         
-        # Create point
+        # Create point (the ID is the point ID - not repeated in the payload)
         point = PointStruct(
             id=point_id,
-            vector=embedding,
-            payload=chunk_data
+            vector=self._point_vector(chunk_data["text"], embedding, self.has_sparse(collection_name)),
+            payload={key: value for key, value in chunk_data.items() if key != "id"}
         )
         
         # Save to Qdrant
@@ -295,53 +545,190 @@ class QdrantService:
             points=[point]
         )
         
+        if collection_name == self.collections.get(collection):
+            self._mirror_upsert(collection, [(point_id, embedding, point.payload)])
+        
         return point_id
     
     #method: search across collections with optional category filter
-    def search(self, query: str, collection: str = None, limit: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, collection: str = None, limit: int = 5,
+               payload_include: Union[List[str], bool, None] = None, payload_exclude: List[str] = None) -> List[Dict[str, Any]]:
         """
         Search across one or all collections
-        If collection is None, searches both collections
+        If collection is None, searches both collections (one batched search)
         """
-        # Generate query embedding
-        query_embedding = self.embedder.encode(query).tolist()
-        
-        results = []
-        
         if collection is None:
             # Search both collections
-            collections_to_search = list(self.collections.values())
+            collections_to_search = list(self.collections.keys())
         else:
             # Search specific collection
-            collections_to_search = [self.collections.get(collection)]
+            collections_to_search = [collection]
+        
+        batches = self.search_batch(query, [
+            {"collection": key, "limit": limit, "payload_include": payload_include, "payload_exclude": payload_exclude}
+            for key in collections_to_search
+        ])
+        
+        # Sort by score
+        results = [result for batch in batches for result in batch]
+        results.sort(key=lambda x: x["score"], reverse=True)
+        return results[:limit]
+    
+    #method: group batch sub-queries by collection into Qdrant SearchRequests
+    def _plan_batch(self, query_embedding: List[float], subqueries: List[Dict[str, Any]],
+                    sparse_query: Dict[str, List] = None, sparse_ready: Dict[str, bool] = None) -> Dict[str, List[Tuple[int, str, SearchRequest]]]:
+        """
+        Build {collection_key: [(position, leg, SearchRequest), ...]} for a batched search.
+        Sub-query keys: collection, limit, category, filter (raw Filter), score_threshold,
+        payload_include / payload_exclude (see _payload_selector),
+        mode="hybrid" (adds a sparse BM25 leg fused with RRF; score_threshold applies to the dense leg only)
+        """
+        plan = {}
+        for position, subquery in enumerate(subqueries):
+            collection = subquery.get("collection", "knowledge_base")
+            if not self.collections.get(collection):
+                print(f"Collection {collection} not found")
+                continue
+            
+            query_filter = subquery.get("filter") or self._category_filter(subquery.get("category"))
+            payload = self._payload_selector(collection, subquery.get("payload_include"), subquery.get("payload_exclude"))
+            limit = subquery.get("limit", 5)
+            
+            plan.setdefault(collection, []).append((position, "dense", SearchRequest(
+                vector=query_embedding,
+                filter=query_filter,
+                limit=limit,
+                score_threshold=subquery.get("score_threshold"),
+                with_payload=payload,
+                with_vector=False
+            )))
+            
+            # Hybrid degrades to dense-only on collection versions built before sparse vectors existed
+            if subquery.get("mode") == "hybrid" and sparse_query and (sparse_ready or {}).get(collection):
+                plan[collection].append((position, "sparse", SearchRequest(
+                    vector=NamedSparseVector(name=SPARSE_VECTOR_NAME, vector=SparseVector(**sparse_query)),
+                    filter=query_filter,
+                    limit=limit,
+                    with_payload=payload,
+                    with_vector=True  # dense vector lets lexical-only hits get a cosine score
+                )))
+        return plan
+    
+    #method: turn one collection's search_batch response into per-sub-query results
+    def _collect_batch(self, collection: str, planned, batch_hits, query_embedding: List[float],
+                       subqueries: List[Dict[str, Any]], results: List[List[Dict[str, Any]]]):
+        collection_name = self.collections[collection]
+        legs = {}
+        for (position, leg, _), hits in zip(planned, batch_hits):
+            legs.setdefault(position, {})[leg] = [self._format_hit(hit, collection, collection_name) for hit in hits]
         
-        for collection_name in collections_to_search:
+        for position, by_leg in legs.items():
+            if "sparse" in by_leg:
+                results[position] = self._fuse_hybrid(by_leg["dense"], by_leg["sparse"], query_embedding, subqueries[position].get("limit", 5))
+            else:
+                results[position] = by_leg["dense"]
+    
+    #method: sparse query vector, only when some sub-query is hybrid
+    def _sparse_query(self, query: str, subqueries: List[Dict[str, Any]]) -> Optional[Dict[str, List]]:
+        if not any(subquery.get("mode") == "hybrid" for subquery in subqueries):
+            return None
+        sparse_query = sparse_encoder.encode_query(query)
+        return sparse_query if sparse_query["indices"] else None
+    
+    #method: batched search - several sub-queries sharing one query vector
+    def search_batch(self, query: str, subqueries: List[Dict[str, Any]], query_vector: List[float] = None,
+                     failed: List[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Run several sub-queries (different collections, filters, limits) for one query.
+        The query is embedded once (or query_vector is reused) and each collection gets a single search_batch request.
+        Returns one result list per sub-query, in the same order.
+        failed: if given, collects collections that could not be searched (Qdrant error, no mirror to fall back to),
+        so callers can tell "no hits" from "search failed"
+        """
+        query_embedding = query_vector or self.embedder.encode(query).tolist()
+        sparse_query = self._sparse_query(query, subqueries)
+        sparse_ready = {key: self.has_sparse(name) for key, name in self.collections.items()} if sparse_query else {}
+        results = [[] for _ in subqueries]
+        
+        for collection, planned in self._plan_batch(query_embedding, subqueries, sparse_query, sparse_ready).items():
+            collection_name = self.collections[collection]
+            if self._mirror_serves(collection, planned):
+                self._mirror_search(collection, planned, query_embedding, subqueries, results)
+                continue
             try:
-                search_results = self.client.search(
+                batch_hits = self.client.search_batch(
                     collection_name=collection_name,
-                    query_vector=query_embedding,
-                    limit=limit
+                    requests=[request for _, _, request in planned]
                 )
-                
-                for result in search_results:
-                    result_data = {
-                        "score": result.score,
-                        "text": result.payload.get("text", ""),
-                        "metadata": result.payload.get("metadata", {}),
-                        "collection": collection,
-                        "source": collection_name,
-                        "payload": result.payload
-                    }
-                    results.append(result_data)
+                self._collect_batch(collection, planned, batch_hits, query_embedding, subqueries, results)
             except Exception as e:
                 print(f"Error searching collection {collection_name}: {e}")
+                if not self._mirror_search(collection, planned, query_embedding, subqueries, results, fallback=True) \
+                        and failed is not None:
+                    failed.append(collection)
         
-        # Sort by score
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:limit]
+        return results
+    
+    # VECTOR MIRROR HOOKS - no-ops unless VECTOR_MIRROR_ENABLED
+    
+    #method: pass points written to a served collection on to the mirror
+    def _mirror_upsert(self, collection: str, points: List[Tuple[str, List[float], Dict[str, Any]]]):
+        if self.vector_mirror:
+            self.vector_mirror.on_upsert(collection, [
+                {"id": str(point_id), "vector": vector, "payload": payload} for point_id, vector, payload in points
+            ])
+    
+    #method: served collection replaced or emptied - mirror reloads it
+    def _mirror_reset(self, collection: str):
+        if self.vector_mirror:
+            self.vector_mirror.on_reset(collection)
+    
+    #method: dense-only sub-queries on a mirrored collection can skip Qdrant (VECTOR_MIRROR_SERVE)
+    def _mirror_serves(self, collection: str, planned) -> bool:
+        return bool(self.vector_mirror and self.vector_mirror.serving(collection)
+                    and all(leg == "dense" for _, leg, _ in planned))
+    
+    #method: answer one collection's planned sub-queries from the mirror
+    def _mirror_search(self, collection: str, planned, query_embedding: List[float],
+                       subqueries: List[Dict[str, Any]], results: List[List[Dict[str, Any]]], fallback: bool = False) -> bool:
+        """Returns False when the mirror cannot serve the collection (disabled or not loaded)"""
+        if not (self.vector_mirror and self.vector_mirror.ready(collection)):
+            return False
+        if fallback:
+            print(f"Serving {collection} from the in-process vector mirror")
+            metrics.increment("vector_mirror_fallbacks", collection=collection)
+        positions = sorted({position for position, _, _ in planned})
+        hits = self.vector_mirror.search_batch(query_embedding, [subqueries[position] for position in positions])
+        for position, position_hits in zip(positions, hits):
+            results[position] = position_hits
+        return True
+    
+    #method: yield (id, dense vector, payload) for every point - used to load the vector mirror
+    def iter_vectors(self, collection: str, page_size: int = SCROLL_PAGE_SIZE) -> Iterator[Tuple[str, List[float], Dict[str, Any]]]:
+        collection_name = self.collections.get(collection)
+        if not collection_name:
+            return
+        
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            for point in points:
+                vector = point.vector.get("") if isinstance(point.vector, dict) else point.vector
+                if vector is not None:
+                    yield str(point.id), vector, point.payload or {}
+            
+            if offset is None:
+                return
     
     #method: search with category filter (for knowledge base)
-    def search_with_filter(self, query: str, category: str = None, collection: str = "knowledge_base", limit: int = 10) -> List[Dict[str, Any]]:
+    def search_with_filter(self, query: str, category: str = None, collection: str = "knowledge_base", limit: int = 10,
+                           payload_include: Union[List[str], bool, None] = None, payload_exclude: List[str] = None) -> List[Dict[str, Any]]:
         """
         Search with category filter
         """
@@ -372,7 +759,9 @@ class QdrantService:
                 collection_name=collection_name,
                 query_vector=query_embedding,
                 query_filter=search_filter,
-                limit=limit * 2  # Get more results for confidence filtering
+                limit=limit * 2,  # Get more results for confidence filtering
+                with_payload=self._payload_selector(collection, payload_include, payload_exclude),
+                with_vectors=False
             )
             
             # Format results
@@ -394,32 +783,39 @@ class QdrantService:
             print(f"Error searching collection {collection_name} with filter: {e}")
             return []
     #method: get all cases in special_cases
-    def get_all_cases(self) -> List[Dict[str, Any]]:
+    def get_all_cases(self, payload_include: Union[List[str], bool] = True) -> List[Dict[str, Any]]:
         """Get all cases from special_cases collection (for backward compatibility)"""
-        return self._get_all_from_collection("special_cases")
+        return self._get_all_from_collection("special_cases", payload_include)
     
     #method: get all documents from a collection
-    def _get_all_from_collection(self, collection: str) -> List[Dict[str, Any]]:
-        """Get all documents from a collection"""
+    def _get_all_from_collection(self, collection: str, payload_include: Union[List[str], bool] = True) -> List[Dict[str, Any]]:
+        """Get all documents from a collection (payload_include limits the returned fields)"""
+        return list(self.iter_collection(collection, payload_include=payload_include))
+    
+    #method: iterate over a collection page by page (constant memory per page)
+    def iter_collection(self, collection: str, page_size: int = SCROLL_PAGE_SIZE,
+                        payload_include: Union[List[str], bool] = True) -> Iterator[Dict[str, Any]]:
+        """Yield payloads of every point, scrolling page_size points at a time (Qdrant errors propagate)"""
         collection_name = self.collections.get(collection)
         if not collection_name:
-            return []
+            return
         
-        try:
-            points = self.client.scroll(
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
                 collection_name=collection_name,
-                limit=10000,
-                with_payload=True
-            )[0]
+                limit=page_size,
+                offset=offset,
+                with_payload=self._payload_selector(collection, payload_include),
+                with_vectors=False
+            )
             
-            documents = []
             for point in points:
                 if point.payload:
-                    documents.append(dict(point.payload))
-            return documents
-        except Exception as e:
-            print(f"Error getting documents from {collection_name}: {e}")
-            return []
+                    yield dict(point.payload)
+            
+            if offset is None:
+                return
     
     #method: get case count in special_cases
     def get_case_count(self) -> int:
@@ -441,24 +837,318 @@ class QdrantService:
         except:
             return 0
     
-    #method: get database info (collections, counts, host info)
-    def get_database_info(self) -> Dict[str, Any]:
-        """Get comprehensive database information"""
+    #method: build category filter for knowledge base payloads
+    def _category_filter(self, category: Optional[str]) -> Optional[Filter]:
+        """Return a metadata.category filter, or None for no/all categories"""
+        if not category or category == ALL_CATEGORIES_KEY:
+            return None
+        return Filter(
+            must=[
+                FieldCondition(
+                    key="metadata.category",
+                    match=MatchValue(value=category)
+                )
+            ]
+        )
+    
+    #method: format a scored point into a result dict
+    def _format_hit(self, hit, collection: Optional[str], collection_name: str) -> Dict[str, Any]:
+        """Format a Qdrant hit the same way as the sync search methods"""
+        payload = hit.payload or {}
+        result = {
+            "id": str(hit.id),
+            "score": hit.score,
+            "text": payload.get("text", ""),
+            "metadata": payload.get("metadata", {}),
+            "collection": collection,
+            "source": collection_name,
+            "payload": payload
+        }
+        if hit.vector is not None:
+            result["vector"] = hit.vector
+        return result
+    
+    # ASYNC API - used by FastAPI handlers so searches do not block the event loop
+    
+    #method: embed text(s) in the dedicated embedding executor
+    async def aembed(self, texts):
+        """Encode a string (or list of strings) without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(self.embed_executor, self.embedder.encode, texts)
+        return embeddings.tolist()
+    
+    #method: async search across one or all collections
+    async def asearch(self, query: str, collection: str = None, limit: int = 5, category: str = None) -> List[Dict[str, Any]]:
+        """
+        Async counterpart of search()
+        If collection is None, searches both collections (one batched search)
+        """
+        if collection is None:
+            targets = list(self.collections.keys())
+        else:
+            targets = [collection]
+        
+        # Category filter only applies to knowledge base payloads
+        batches = await self.asearch_batch(query, [
+            {"collection": key, "limit": limit, "category": category if key == "knowledge_base" else None}
+            for key in targets
+        ])
+        
+        results = [result for batch in batches for result in batch]
+        results.sort(key=lambda x: x["score"], reverse=True)
+        return results[:limit]
+    
+    #method: async batched search - several sub-queries sharing one query vector
+    async def asearch_batch(self, query: str, subqueries: List[Dict[str, Any]], query_vector: List[float] = None,
+                            failed: List[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Async counterpart of search_batch()
+        Per-collection batch requests are sent concurrently, so the whole batch costs one round trip
+        """
+        query_embedding = query_vector or await self.aembed(query)
+        sparse_query = self._sparse_query(query, subqueries)
+        sparse_ready = {key: await self.ahas_sparse(name) for key, name in self.collections.items()} if sparse_query else {}
+        results = [[] for _ in subqueries]
+        
+        async def search_collection(collection, planned):
+            collection_name = self.collections[collection]
+            if self._mirror_serves(collection, planned):
+                self._mirror_search(collection, planned, query_embedding, subqueries, results)
+                return
+            try:
+                batch_hits = await self.async_client.search_batch(
+                    collection_name=collection_name,
+                    requests=[request for _, _, request in planned]
+                )
+                self._collect_batch(collection, planned, batch_hits, query_embedding, subqueries, results)
+            except Exception as e:
+                print(f"Error searching collection {collection_name}: {e}")
+                if not self._mirror_search(collection, planned, query_embedding, subqueries, results, fallback=True) \
+                        and failed is not None:
+                    failed.append(collection)
+        
+        plan = self._plan_batch(query_embedding, subqueries, sparse_query, sparse_ready)
+        await asyncio.gather(*(search_collection(collection, planned) for collection, planned in plan.items()))
+        return results
+    
+    #method: decide whether an adaptive top-k search should widen its limit
+    @staticmethod
+    def should_widen(scores: List[float], limit: int, min_gap: float) -> bool:
+        """
+        True when the page is full (score_threshold did not cut it) and the
+        scores show no clear gap, i.e. more relevant hits probably follow.
+        """
+        if len(scores) < limit:
+            return False
+        drops = [higher - lower for higher, lower in zip(scores, scores[1:])]
+        return not drops or max(drops) < min_gap
+    
+    #method: async search grouped by a payload field (e.g. one group per source file)
+    async def asearch_groups(self, query: str, collection: str = "knowledge_base", group_by: str = "metadata.doc_id",
+                             limit: int = 10, group_size: int = 3, category: str = None) -> List[Dict[str, Any]]:
+        """
+        Search and group hits by payload field
+        Returns list of {"group_id", "hits"} with hits formatted like asearch()
+        """
+        collection_name = self.collections.get(collection)
+        if not collection_name:
+            return []
+        
+        query_embedding = await self.aembed(query)
+        
+        try:
+            groups_result = await self.async_client.search_groups(
+                collection_name=collection_name,
+                query_vector=query_embedding,
+                query_filter=self._category_filter(category),
+                group_by=group_by,
+                limit=limit,
+                group_size=group_size,
+                with_payload=self._payload_selector(collection),
+                with_vectors=False
+            )
+            return [
+                {
+                    "group_id": group.id,
+                    "hits": [self._format_hit(hit, collection, collection_name) for hit in group.hits]
+                }
+                for group in groups_result.groups
+            ]
+        except Exception as e:
+            print(f"Error grouping search in {collection_name}: {e}")
+            return []
+    
+    #method: async count (optionally within a category)
+    async def acount(self, collection: str, category: str = None) -> int:
+        """Async point count in a collection, optionally filtered by category"""
+        collection_name = self.collections.get(collection)
+        if not collection_name:
+            return 0
+        
+        try:
+            result = await self.async_client.count(
+                collection_name=collection_name,
+                count_filter=self._category_filter(category)
+            )
+            return result.count
+        except Exception as e:
+            print(f"Error counting {collection_name}: {e}")
+            return 0
+    
+    #method: async batch upsert of document chunks (one embedding pass, one request)
+    async def aupsert_batch(self, chunks: List[Dict[str, Any]], collection: str = "knowledge_base") -> List[str]:
+        """Embed and upsert a list of chunk records ({"id", "text", ...}) in one call"""
+        if not chunks:
+            return []
+        
+        collection_name = self.collections.get(collection, KNOWLEDGE_BASE_COLLECTION)
+        embeddings = await self.aembed([chunk["text"] for chunk in chunks])
+        with_sparse = await self.ahas_sparse(collection_name)
+        
+        points = [
+            PointStruct(id=str(chunk["id"]), vector=self._point_vector(chunk["text"], embedding, with_sparse), payload={key: value for key, value in chunk.items() if key != "id"})
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+        
+        await self.async_client.upsert(
+            collection_name=collection_name,
+            points=points
+        )
+        
+        self._mirror_upsert(collection, [(point.id, embedding, point.payload) for point, embedding in zip(points, embeddings)])
+        
+        return [point.id for point in points]
+    
+    #method: async scroll one page of a collection
+    async def ascroll(self, collection: str, limit: int = 256, offset=None,
+                      payload_include: Union[List[str], bool] = True) -> Tuple[List[Dict[str, Any]], Any]:
+        """
+        Scroll one page of payloads (payload_include limits the returned fields)
+        Returns (payloads, next_offset); next_offset is None on the last page.
+        Qdrant errors propagate - an empty page with no offset would read as the end of the collection
+        """
+        collection_name = self.collections.get(collection)
+        if not collection_name:
+            return [], None
+        
+        points, next_offset = await self.async_client.scroll(
+            collection_name=collection_name,
+            limit=limit,
+            offset=offset,
+            with_payload=self._payload_selector(collection, payload_include),
+            with_vectors=False
+        )
+        return [dict(point.payload) for point in points if point.payload], next_offset
+    
+    #method: async iterate over a collection page by page (constant memory per page)
+    async def aiter_collection(self, collection: str, page_size: int = SCROLL_PAGE_SIZE,
+                               payload_include: Union[List[str], bool] = True) -> AsyncIterator[Dict[str, Any]]:
+        """Async generator yielding payloads of every point, one scroll page at a time"""
+        offset = None
+        while True:
+            page, offset = await self.ascroll(collection, limit=page_size, offset=offset, payload_include=payload_include)
+            for payload in page:
+                yield payload
+            if offset is None:
+                return
+    
+    #method: async get database info
+    async def aget_database_info(self) -> Dict[str, Any]:
+        """Async counterpart of get_database_info()"""
+        return self._database_info(await self.aget_stats())
+    
+    # COLLECTION STATS VIEW - cached counts so request paths do not hit Qdrant
+    
+    #method: record an index change (ingestion, watcher event, clear)
+    def mark_index_changed(self, ingested: bool = False):
+        """Bump the index generation and drop cached stats; ingested=True also stamps the ingestion time"""
+        with self._stats_lock:
+            self.index_generation += 1
+            if ingested:
+                self.last_ingestion_time = time.time()
+            self._stats = None
+    
+    #method: (collection, category) pairs counted by the stats view
+    def _stats_keys(self) -> List[Tuple[str, Optional[str]]]:
+        return [(collection, None) for collection in self.collections] + \
+               [("knowledge_base", category) for category in KNOWLEDGE_BASE_CATEGORIES]
+    
+    #method: assemble stats dict from raw counts
+    def _build_stats(self, counts: List[int], qdrant_ok: bool, generation: int) -> Dict[str, Any]:
+        collections = {
+            collection: {"name": collection_name, "count": 0}
+            for collection, collection_name in self.collections.items()
+        }
+        collections["knowledge_base"]["categories"] = {}
+        
+        for (collection, category), count in zip(self._stats_keys(), counts):
+            if category is None:
+                collections[collection]["count"] = count
+            else:
+                collections[collection]["categories"][category] = count
+        
+        return {
+            "collections": collections,
+            "index_generation": generation,
+            "last_ingestion_time": datetime.datetime.fromtimestamp(self.last_ingestion_time).isoformat() if self.last_ingestion_time else None,
+            "qdrant_ok": qdrant_ok,
+            "refreshed_at": time.time()
+        }
+    
+    #method: check whether cached stats can be served
+    def _stats_fresh(self) -> bool:
+        stats = self._stats
+        return (stats is not None
+                and stats["index_generation"] == self.index_generation
+                and time.time() - stats["refreshed_at"] < STATS_TTL_SECONDS)
+    
+    #method: get cached collection stats (refresh on TTL or index change)
+    def get_stats(self) -> Dict[str, Any]:
+        """Counts per collection and per category, last ingestion time and index generation"""
+        if not self._stats_fresh():
+            generation = self.index_generation
+            try:
+                counts = [
+                    self.client.count(collection_name=self.collections[collection], count_filter=self._category_filter(category)).count
+                    for collection, category in self._stats_keys()
+                ]
+                self._stats = self._build_stats(counts, True, generation)
+            except Exception as e:
+                print(f"Error refreshing collection stats: {e}")
+                self._stats = self._build_stats([0] * len(self._stats_keys()), False, generation)
+        return self._stats
+    
+    #method: async get cached collection stats
+    async def aget_stats(self) -> Dict[str, Any]:
+        """Async counterpart of get_stats() - counts are requested concurrently"""
+        if not self._stats_fresh():
+            generation = self.index_generation
+            try:
+                results = await asyncio.gather(*(
+                    self.async_client.count(collection_name=self.collections[collection], count_filter=self._category_filter(category))
+                    for collection, category in self._stats_keys()
+                ))
+                self._stats = self._build_stats([result.count for result in results], True, generation)
+            except Exception as e:
+                print(f"Error refreshing collection stats: {e}")
+                self._stats = self._build_stats([0] * len(self._stats_keys()), False, generation)
+        return self._stats
+    
+    #method: format database info from the stats view
+    def _database_info(self, stats: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "storage": "qdrant",
-            "collections": {
-                "special_cases": {
-                    "name": SPECIAL_CASES_COLLECTION,
-                    "count": self._get_collection_count("special_cases")
-                },
-                "knowledge_base": {
-                    "name": KNOWLEDGE_BASE_COLLECTION,
-                    "count": self._get_collection_count("knowledge_base")
-                }
-            },
+            "collections": stats["collections"],
+            "index_generation": stats["index_generation"],
+            "last_ingestion_time": stats["last_ingestion_time"],
             "qdrant_host": QDRANT_HOST,
             "qdrant_port": QDRANT_PORT
         }
+    
+    #method: get database info (collections, counts, host info)
+    def get_database_info(self) -> Dict[str, Any]:
+        """Get comprehensive database information (served from the cached stats view)"""
+        return self._database_info(self.get_stats())
 
 
 # Singleton instance
@@ -469,22 +1159,45 @@ qdrant_service = QdrantService()
 def load_all_cases() -> List[Dict[str, Any]]:
     return qdrant_service.get_all_cases()
 
-# Return a lightweight summary list for each saved case
-def list_cases_summary() -> List[Dict[str, Any]]:
-    cases = []
-    for case in qdrant_service.get_all_cases():
-        cases.append({
-            "case_id": case.get("case_id"),
-            "title": case.get("title"),
-            "author": case.get("author"),
-            "created_at": case.get("created_at")
-        })
-    return cases
+# Summary fields of one case payload
+def _case_summary(case: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "case_id": case.get("case_id"),
+        "title": case.get("title"),
+        "author": case.get("author"),
+        "created_at": case.get("created_at")
+    }
 
-# Return total number of cases in the special_cases collection
+# Return total number of cases in the special_cases collection (cached stats view)
 def get_case_count() -> int:
-    return qdrant_service.get_case_count()
+    return qdrant_service.get_stats()["collections"]["special_cases"]["count"]
 
 # Return database/collection metadata and host info
 def get_database_info() -> Dict[str, Any]:
     return qdrant_service.get_database_info()
+
+
+# Async helpers for FastAPI handlers
+async def alist_cases_page(limit: int, cursor=None) -> Dict[str, Any]:
+    """One page of case summaries; next_cursor is None on the last page"""
+    cases, next_offset = await qdrant_service.ascroll(
+        "special_cases", limit=limit, offset=cursor, payload_include=CASE_SUMMARY_FIELDS
+    )
+    return {
+        "cases": [_case_summary(case) for case in cases],
+        "next_cursor": str(next_offset) if next_offset is not None else None
+    }
+
+async def aiter_cases() -> AsyncIterator[Dict[str, Any]]:
+    """Stream full case payloads one scroll page at a time"""
+    async for case in qdrant_service.aiter_collection("special_cases"):
+        yield case
+
+async def aget_case_count() -> int:
+    return (await qdrant_service.aget_stats())["collections"]["special_cases"]["count"]
+
+async def aget_stats() -> Dict[str, Any]:
+    return await qdrant_service.aget_stats()
+
+async def aget_database_info() -> Dict[str, Any]:
+    return await qdrant_service.aget_database_info()
\ No newline at end of file
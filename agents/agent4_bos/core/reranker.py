@@ -0,0 +1,139 @@
+#imports
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from .config import (
+    RERANKER_MODEL, RERANK_TOP_N, RERANK_BUDGET_MS, RERANK_CACHE_SIZE, RERANK_MAX_CHARS,
+)
+from .metrics import metrics
+
+#class: Reranker - cross-encoder rerank of the top grouped candidates with a latency budget and LRU cache
+class Reranker:
+    def __init__(self, model_name: str = RERANKER_MODEL, top_n: int = RERANK_TOP_N,
+                 budget_ms: float = RERANK_BUDGET_MS, cache_size: int = RERANK_CACHE_SIZE):
+        self.model_name = model_name
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Single worker - forward passes are serialized and never block the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+    #method: load the cross-encoder on first use
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                print(f"Loading reranker model: {self.model_name}")
+                self._model = CrossEncoder(self.model_name, max_length=512)
+            return self._model
+
+    #method: passage used to score a grouped candidate
+    def _passage(self, doc: Dict[str, Any]) -> str:
+        return (doc.get("best_chunk") or doc.get("content", ""))[:RERANK_MAX_CHARS]
+
+    #method: cache key (query, chunk hash)
+    def _cache_key(self, query: str, passage: str):
+        return (query, hashlib.md5(passage.encode("utf-8")).hexdigest())
+
+    #method: LRU lookup
+    def _cache_get(self, key) -> Optional[float]:
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    #method: LRU insert with eviction
+    def _cache_put(self, key, score: float):
+        with self._cache_lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    #method: one batched forward pass; scores are cached even if the caller already gave up
+    def _score(self, keys: List, pairs: List) -> List[float]:
+        scores = [float(score) for score in self._get_model().predict(pairs, batch_size=len(pairs))]
+        for key, score in zip(keys, scores):
+            self._cache_put(key, score)
+        return scores
+
+    #method: rerank the top-N candidates within the latency budget
+    async def arerank(self, query: str, docs: List[Dict[str, Any]], budget_ms: float = None) -> Dict[str, Any]:
+        """
+        Reorder the first top_n docs by cross-encoder score (rest keep their order).
+        Returns {"docs", "applied", "latency_ms", "top1_changed", "cache_hits"}.
+        If the budget runs out, the original order is returned unchanged.
+        budget_ms: caller's budget (e.g. what is left of the request deadline), capped by RERANK_BUDGET_MS
+        """
+        start = time.perf_counter()
+        budget_ms = self.budget_ms if budget_ms is None else min(budget_ms, self.budget_ms)
+        candidates = docs[:self.top_n]
+        if len(candidates) < 2:
+            return {"docs": docs, "applied": False, "latency_ms": 0.0, "top1_changed": False, "cache_hits": 0}
+
+        keys = [self._cache_key(query, self._passage(doc)) for doc in candidates]
+        scores = [self._cache_get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        cache_hits = len(candidates) - len(missing)
+        metrics.increment("rerank_cache_hits", cache_hits)
+        metrics.increment("rerank_cache_misses", len(missing))
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._executor, self._score,
+                [keys[i] for i in missing],
+                [(query, self._passage(candidates[i])) for i in missing]
+            )
+            try:
+                new_scores = await asyncio.wait_for(asyncio.shield(future), timeout=budget_ms / 1000)
+            except asyncio.TimeoutError:
+                latency_ms = (time.perf_counter() - start) * 1000
+                print(f"Rerank budget exceeded ({latency_ms:.0f} ms) - keeping retrieval order")
+                metrics.increment("rerank_budget_exceeded")
+                return {"docs": docs, "applied": False, "latency_ms": round(latency_ms, 1), "top1_changed": False, "cache_hits": cache_hits}
+            except Exception as e:
+                print(f"Rerank failed: {e}")
+                metrics.increment("rerank_errors")
+                return {"docs": docs, "applied": False, "latency_ms": 0.0, "top1_changed": False, "cache_hits": cache_hits}
+            for i, score in zip(missing, new_scores):
+                scores[i] = score
+
+        for doc, score in zip(candidates, scores):
+            doc["rerank_score"] = round(score, 4)
+        reranked = sorted(candidates, key=lambda doc: doc["rerank_score"], reverse=True) + docs[self.top_n:]
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        top1_changed = reranked[0] is not docs[0]
+        metrics.observe("rerank_latency_ms", latency_ms)
+        metrics.increment("rerank_requests")
+        if top1_changed:
+            metrics.increment("rerank_top1_changed")
+
+        return {"docs": reranked, "applied": True, "latency_ms": round(latency_ms, 1), "top1_changed": top1_changed, "cache_hits": cache_hits}
+
+    #method: summary for /metrics
+    def get_info(self) -> Dict[str, Any]:
+        requests_count = metrics.get_counter("rerank_requests")
+        changed = metrics.get_counter("rerank_top1_changed")
+        return {
+            "model": self.model_name,
+            "top_n": self.top_n,
+            "budget_ms": self.budget_ms,
+            "cache_entries": len(self._cache),
+            "top1_change_rate": round(changed / requests_count, 3) if requests_count else None
+        }
+
+
+# Singleton instance
+reranker = Reranker()
@@ -0,0 +1,68 @@
+#imports
+from typing import Dict, Any
+from .config import ALL_CATEGORIES_KEY, MIN_CONFIDENCE
+from .metrics import metrics
+
+# Deterministic replies - rendered locally instead of asking the LLM to phrase them
+TEMPLATES = {
+    # nothing matched at all
+    "not_found": (
+        "Nie znalazłem w bazie wiedzy ({category_label}) dokumentu dotyczącego: \"{query}\".\n\n"
+        "Czy chcesz, abym wygenerował taki dokument teraz? Jeśli tak, napisz: \"Tak, wygeneruj\"."
+    ),
+    # something matched, but below MIN_CONFIDENCE - ask whether to generate
+    "generation_confirmation": (
+        "Nie znalazłem dobrze dopasowanego dokumentu dotyczącego: \"{query}\" ({category_label}). "
+        "Najlepsze znalezione dopasowanie to tylko {best_confidence:g}% (potrzebne co najmniej {min_confidence:g}%).\n\n"
+        "Czy chcesz, abym wygenerował ten dokument teraz? Jeśli tak, napisz: \"Tak, wygeneruj\"."
+    ),
+    "generation_success": (
+        "Zgodnie z Twoją prośbą wygenerowałem dokument na temat: '{topic}'.\n"
+        "Został on zapisany w kategorii '{category}'.\n\n"
+        "Nazwa pliku: {filename}\n"
+        "Link do pobrania: {download_url}"
+    ),
+    "generation_error": "Wystąpił błąd podczas generowania dokumentu: {error}",
+    # request deadline used up before the answer could be generated
+    "degraded_answer": (
+        "Nie zdążyłem przygotować pełnej odpowiedzi w wyznaczonym czasie. "
+        "Najlepiej pasujący dokument: {filename} (dopasowanie {confidence}%).\n\n"
+        "Fragment:\n{snippet}\n\n"
+        "Link: {link}"
+    ),
+    # the LLM failed (error / unreachable) - same fallback, different reason
+    "degraded_answer_error": (
+        "Nie udało się wygenerować pełnej odpowiedzi (usługa modelu językowego jest chwilowo niedostępna). "
+        "Najlepiej pasujący dokument: {filename} (dopasowanie {confidence}%).\n\n"
+        "Fragment:\n{snippet}\n\n"
+        "Link: {link}"
+    ),
+    "deadline_exceeded": "Nie udało się przygotować odpowiedzi w wyznaczonym czasie. Spróbuj ponownie za chwilę.",
+}
+
+#class: ResponseTemplates - renders the fixed reply types from query, category and scores
+class ResponseTemplates:
+    def __init__(self, templates: Dict[str, str] = None):
+        self.templates = templates if templates is not None else TEMPLATES
+
+    #method: human-readable category for the reply
+    def category_label(self, category: str) -> str:
+        if not category or category == ALL_CATEGORIES_KEY:
+            return "wszystkie kategorie"
+        return f"kategoria '{category}'"
+
+    #method: render one template
+    def render(self, name: str, **values: Any) -> str:
+        values.setdefault("category_label", self.category_label(values.get("category")))
+        values.setdefault("min_confidence", MIN_CONFIDENCE)
+        metrics.increment("response_templates_rendered", template=name)
+        return self.templates[name].format(**values)
+
+    #method: no-match reply - confirmation question when something partially matched, plain "not found" otherwise
+    def render_not_found(self, query: str, category: str, best_confidence: float) -> str:
+        name = "generation_confirmation" if best_confidence > 0 else "not_found"
+        return self.render(name, query=query, category=category, best_confidence=best_confidence)
+
+
+# Singleton instance
+response_templates = ResponseTemplates()
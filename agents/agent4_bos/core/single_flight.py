@@ -0,0 +1,88 @@
+#imports
+import copy
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Awaitable, Hashable
+from .metrics import metrics
+
+#function: normalize a user query for coalescing (case and whitespace insensitive)
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+#class: AsyncSingleFlight - concurrent identical coroutine calls share one in-flight computation
+class AsyncSingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+
+    #method: run fn() once per key; callers arriving while it runs await the same result
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        A cancelled leader (e.g. its client disconnected) is not a result: its followers
+        retry - the first of them becomes the new leader and runs fn() itself.
+        """
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            metrics.increment("singleflight_coalesced", level=self.name)
+            try:
+                # shield: a follower that is cancelled must not cancel the leader's work
+                return copy.deepcopy(await asyncio.shield(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # this follower itself was cancelled
+                metrics.increment("singleflight_leader_cancelled", level=self.name)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        metrics.increment("singleflight_leaders", level=self.name)
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody else awaited is not logged as unhandled
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+#class: SingleFlight - thread-safe variant for blocking calls made from worker threads
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    #method: run fn() once per key; threads arriving while it runs block on the same result
+    def run(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            metrics.increment("singleflight_coalesced", level=self.name)
+            return copy.deepcopy(future.result())
+
+        metrics.increment("singleflight_leaders", level=self.name)
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
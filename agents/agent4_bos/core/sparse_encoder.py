@@ -0,0 +1,76 @@
+#imports
+import re
+import zlib
+from collections import Counter
+from typing import List, Dict
+from .config import BM25_K1, BM25_B, BM25_AVG_DOC_LENGTH
+
+# Frequent Polish function words - carry no lexical signal
+POLISH_STOPWORDS = {
+    "a", "aby", "ale", "bo", "by", "być", "co", "czy", "do", "dla", "i", "ich", "ile", "jak", "jaki", "jakie",
+    "jest", "jestem", "już", "kiedy", "kto", "lub", "ma", "mam", "mi", "mnie", "może", "na", "nad", "nie",
+    "o", "od", "oraz", "po", "pod", "przez", "przy", "się", "są", "ta", "tak", "te", "to", "tu", "w", "we",
+    "z", "za", "ze", "że", "żeby", "the", "of", "and", "or", "in", "for",
+}
+
+# Common Polish inflection endings, longest first (light stemmer stand-in)
+POLISH_SUFFIXES = (
+    "owego", "owej", "iego", "ach", "ami", "ego", "emu", "ich", "imi", "owi", "ymi", "ych",
+    "ów", "om", "ie", "ia", "ii", "ym", "im", "ą", "ę", "a", "e", "i", "o", "u", "y",
+)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+#class: SparseEncoder - BM25-style sparse vectors for lexical (keyword) retrieval
+class SparseEncoder:
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B, avg_doc_length: float = BM25_AVG_DOC_LENGTH, stem_length: int = 7):
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = avg_doc_length
+        self.stem_length = stem_length
+
+    #method: split text into normalized stems
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercase, drop stopwords, strip inflection endings and truncate to a fixed prefix"""
+        stems = []
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            if token in POLISH_STOPWORDS or (len(token) < 2 and not token.isdigit()):
+                continue
+            stems.append(self._stem(token))
+        return stems
+
+    #method: crude stemmer - keeps short tokens (e.g. "wf") intact
+    def _stem(self, token: str) -> str:
+        for suffix in POLISH_SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                token = token[:-len(suffix)]
+                break
+        return token[:self.stem_length]
+
+    #method: map a stem to a sparse vector index
+    def _index(self, stem: str) -> int:
+        return zlib.crc32(stem.encode("utf-8"))
+
+    #method: encode a document (chunk) with BM25 term-frequency saturation
+    def encode_document(self, text: str) -> Dict[str, List]:
+        """
+        Document-side BM25 weights: tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)).
+        IDF is applied by Qdrant at query time (sparse vector modifier=IDF).
+        """
+        stems = self.tokenize(text)
+        doc_length = len(stems)
+        weights = {}
+        for stem, tf in Counter(stems).items():
+            norm = self.k1 * (1 - self.b + self.b * doc_length / self.avg_doc_length)
+            index = self._index(stem)
+            weights[index] = weights.get(index, 0.0) + tf * (self.k1 + 1) / (tf + norm)
+        return {"indices": list(weights.keys()), "values": list(weights.values())}
+
+    #method: encode a query - each distinct stem weighs 1
+    def encode_query(self, text: str) -> Dict[str, List]:
+        indices = sorted({self._index(stem) for stem in self.tokenize(text)})
+        return {"indices": indices, "values": [1.0] * len(indices)}
+
+
+# Singleton instance
+sparse_encoder = SparseEncoder()
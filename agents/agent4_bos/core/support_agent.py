@@ -1,34 +1,48 @@
 #imports
 import json
-from typing import Dict, Any, List
-from .qdrant_service import qdrant_service, load_all_cases
-from .config import KNOWLEDGE_BASE_PATH, SPECIAL_CASES_PATH, KNOWLEDGE_BASE_CATEGORIES, ALL_CATEGORIES_KEY
-from .llm_service import llm_service
+import time
+import asyncio
+from typing import Dict, Any, List, Tuple
+from .qdrant_service import qdrant_service
+from .config import (
+    KNOWLEDGE_BASE_PATH, SPECIAL_CASES_PATH, KNOWLEDGE_BASE_CATEGORIES, ALL_CATEGORIES_KEY,
+    MIN_CONFIDENCE, KNOWLEDGE_SEARCH_LIMIT, SPECIAL_CASES_SEARCH_LIMIT,
+    ADAPTIVE_TOP_K, ADAPTIVE_K_INITIAL, ADAPTIVE_K_GAP,
+    HYBRID_SEARCH, HYBRID_SEARCH_LIMIT, RERANK_ENABLED, ANSWER_CACHE_ENABLED, CONTEXT_PACKING, COMPRESSION_ENABLED,
+    RESPONSE_LLM_PHRASING, DEADLINE_CLASSIFY_SHARE, DEADLINE_ANSWER_MIN_MS, DEADLINE_SNIPPET_CHARS,
+)
+from .llm_service import llm_service, LLM_ERROR_PREFIX
 from .document_generator import document_generator 
+from .reranker import reranker
+from .document_store import document_store
+from .answer_cache import answer_cache
+from .single_flight import AsyncSingleFlight, normalize_query
+from .context_packer import context_packer
+from .compressor import compressor
+from .response_templates import response_templates
+from .deadline import Deadline
+from .metrics import metrics
 
 LAST_SEARCH_CONTEXT = {"query": None, "category": None}
 
-#CLASSIFICATION OF QUERY
-def classify_query_category(query: str) -> str:
-    """
-    Use LLM to classify query into ONE knowledge base category
-    Returns category name or 'all' if uncertain
-    """
-    categories_text = "\n".join([f"- {cat}" for cat in KNOWLEDGE_BASE_CATEGORIES])
-    
-    prompt = f"""Jesteś klasyfikatorem zapytań w systemie uczelnianym. 
+# Identical concurrent /support queries share one search (keyed on the normalized query)
+_search_flight = AsyncSingleFlight("search")
+
+# Fixed system prefixes - identical on every call so Ollama reuses their evaluated tokens (prompt / KV cache);
+# the per-request content (query, documents) goes into the user message after them
+_CATEGORIES_TEXT = "\n".join([f"- {cat}" for cat in KNOWLEDGE_BASE_CATEGORIES])
+
+CLASSIFIER_SYSTEM_PROMPT = f"""Jesteś klasyfikatorem zapytań w systemie uczelnianym. 
 Twoim zadaniem jest określenie, której kategorii dotyczy zapytanie.
 
 DOSTĘPNE KATEGORIE (musisz wybrać tylko jedną):
-{categories_text}
-
-ZAPYTANIE: "{query}"
+{_CATEGORIES_TEXT}
 
 INSTRUKCJE:
 1. Przeanalizuj zapytanie i wybierz JEDNĄ kategorię, która najlepiej pasuje.
-2. Odpowiedz TYLKO nazwą wybranej kategorii (np. "urlopy_zwolnienia").
-3. Jeśli zapytanie jest ogólne lub dotyczy wielu kategorii, odpowiedz "all".
-4. Jeśli nie jesteś pewny, odpowiedz "all".
+2. Odpowiedz TYLKO obiektem JSON z nazwą wybranej kategorii (np. {{"category": "urlopy_zwolnienia"}}).
+3. Jeśli zapytanie jest ogólne lub dotyczy wielu kategorii, wybierz "all".
+4. Jeśli nie jesteś pewny, wybierz "all".
 
 PRZYKŁADY:
 - "Jak złożyć wniosek o urlop dziekański?" → urlopy_zwolnienia
@@ -37,18 +51,65 @@ PRZYKŁADY:
 - "Czy przysługuje mi stypendium socjalne?" → stypendia
 - "Kto ma dostęp do moich danych osobowych?" → dane_osobowe
 - "Informacje o uczelni" → all
-- "Dzień dobry, mam pytanie" → all
+- "Dzień dobry, mam pytanie" → all"""
+
+# Structured output - the classifier can only produce one of the known categories
+CLASSIFIER_SCHEMA = {
+    "type": "object",
+    "properties": {"category": {"type": "string", "enum": KNOWLEDGE_BASE_CATEGORIES + [ALL_CATEGORIES_KEY]}},
+    "required": ["category"]
+}
+
+KNOWLEDGE_SYSTEM_PROMPT = """Jesteś asystentem Biura Obsługi Studenta. Pomagasz pracownikom dziekanatu.
+
+Otrzymasz dokument źródłowy, a po nim pytanie.
+
+INSTRUKCJE:
+1. Odpowiedz na pytanie WYŁĄCZNIE na podstawie tego dokumentu.
+2. Odpowiadaj po polsku.
+3. NIE cytuj dosłownie formularza (nie wypisuj pól).
+4. Jeśli to formularz/wniosek - wyjaśnij do czego służy i gdzie go złożyć.
+5. Na końcu podaj link i dopasowanie."""
+
+SPECIAL_CASE_SYSTEM_PROMPT = """Jesteś asystentem Biura Obsługi Studenta. Pomagasz pracownikom dziekanatu.
+
+Otrzymasz historyczny przypadek, pytanie i szablon odpowiedzi.
+
+INSTRUKCJE:
+1. To jest historyczny przypadek rozwiązania podobnego problemu.
+2. Wyjaśnij dlaczego ten przypadek pasuje do pytania.
+3. Opisz jak rozwiązano ten przypadek.
+4. Odpowiadaj po polsku.
+5. Użyj formatu z szablonu odpowiedzi."""
+
+NO_INFO_SYSTEM_PROMPT = """Jesteś asystentem Biura Obsługi Studenta.
+
+INSTRUKCJE:
+1. Poinformuj użytkownika, że nie znaleziono informacji.
+2. Zaproponuj wygenerowanie nowego dokumentu.
+3. Odpowiadaj po polsku."""
 
-Twoja odpowiedź (TYLKO nazwa kategorii lub "all"):"""
+#CLASSIFICATION OF QUERY
+def classify_query_category(query: str, deadline: Deadline = None) -> str:
+    """
+    Use LLM to classify query into ONE knowledge base category
+    Returns category name or 'all' if uncertain (also when the request deadline leaves no time for it)
+    """
+    prompt = f'ZAPYTANIE: "{query}"'
 
     try:
-        response = llm_service.generate_response(
-            prompt, 
-            temperature=0.5,
-            max_tokens=50
+        if deadline is not None and not deadline.allows("classify", DEADLINE_ANSWER_MIN_MS):
+            print(f"No time left to classify: '{query}' → using 'all'")
+            return ALL_CATEGORIES_KEY
+        parsed, response = llm_service.generate_json(
+            prompt, CLASSIFIER_SCHEMA, task="classify", system=CLASSIFIER_SYSTEM_PROMPT,
+            deadline=deadline.share(DEADLINE_CLASSIFY_SHARE) if deadline is not None else None
         )
+        if parsed is None:
+            print(f"LLM classification failed for: '{query}' → using 'all'")
+            return ALL_CATEGORIES_KEY
         
-        category = response.strip().lower()
+        category = str(parsed["category"]).strip().lower()
         
         # Validate response
         if category in KNOWLEDGE_BASE_CATEGORIES:
@@ -65,106 +126,71 @@ Twoja odpowiedź (TYLKO nazwa kategorii lub "all"):"""
         print(f"Error in LLM classification: {e}")
         return ALL_CATEGORIES_KEY
 
-#SEARCH FUNCTION WITH CATEGORY FILTER
-#CHUNK GROUPING FOR BETTER CONFIDENCE ASSESSMENT
-def search_by_category(query: str, category: str = None) -> List[Dict[str, Any]]:
+#RETRIEVAL - score threshold pushed down to Qdrant, adaptive top-k for knowledge chunks
+async def retrieve_documents(query: str, category: str = None, query_vector: List[float] = None) -> Dict[str, Any]:
     """
-    Search documents in category, group chunks by file, return full documents
+    Retrieve knowledge chunks and special cases above MIN_CONFIDENCE in one batched round trip.
+    With HYBRID_SEARCH knowledge chunks come from dense + BM25 legs fused with RRF
+    (HYBRID_SEARCH_LIMIT per leg; lexical hits are kept even below the threshold).
+    Otherwise, with ADAPTIVE_TOP_K the knowledge limit starts at ADAPTIVE_K_INITIAL and doubles
+    (up to KNOWLEDGE_SEARCH_LIMIT) only while the page is full and shows no clear score gap.
+    Returns {"knowledge_results", "case_results", "best_score", "failed"}; best_score also covers
+    hits below the threshold (from limit=1 probes) for the "not found" message; failed lists
+    collections whose search errored (empty results there mean "unknown", not "no match").
     """
-    if not category or category == ALL_CATEGORIES_KEY:
-        knowledge_results = qdrant_service.search(query, collection="knowledge_base", limit=100)
+    failed = []
+    score_threshold = MIN_CONFIDENCE / 100
+    if HYBRID_SEARCH:
+        knowledge_limit = HYBRID_SEARCH_LIMIT
     else:
-        knowledge_results = qdrant_service.search_all_in_category(
-            query=query,
-            category=category,
-            collection="knowledge_base"
-        )
+        knowledge_limit = ADAPTIVE_K_INITIAL if ADAPTIVE_TOP_K else KNOWLEDGE_SEARCH_LIMIT
+    query_vector = query_vector if query_vector is not None else await qdrant_service.aembed(query)
     
-    case_results = qdrant_service.search(query, collection="special_cases", limit=50)
+    knowledge_results, case_results, knowledge_probe, case_probe = await qdrant_service.asearch_batch(query, [
+        {"collection": "knowledge_base", "category": category, "limit": knowledge_limit, "score_threshold": score_threshold,
+         "mode": "hybrid" if HYBRID_SEARCH else "dense"},
+        {"collection": "special_cases", "limit": SPECIAL_CASES_SEARCH_LIMIT, "score_threshold": score_threshold},
+        {"collection": "knowledge_base", "category": category, "limit": 1},
+        {"collection": "special_cases", "limit": 1}
+    ], query_vector=query_vector, failed=failed)
     
-    # GROUP chunks by source_file
-    documents = {}
+    # Widen only while more relevant chunks are likely (dense mode)
+    while not HYBRID_SEARCH and knowledge_limit < KNOWLEDGE_SEARCH_LIMIT and qdrant_service.should_widen(
+            [r["score"] for r in knowledge_results], knowledge_limit, ADAPTIVE_K_GAP):
+        knowledge_limit = min(knowledge_limit * 2, KNOWLEDGE_SEARCH_LIMIT)
+        print(f"Adaptive top-k: widening knowledge search to {knowledge_limit}")
+        knowledge_results = (await qdrant_service.asearch_batch(query, [
+            {"collection": "knowledge_base", "category": category, "limit": knowledge_limit, "score_threshold": score_threshold}
+        ], query_vector=query_vector, failed=failed))[0]
     
-    for result in knowledge_results:
-        metadata = result.get("metadata", {})
-        source_file = metadata.get("source_file", "Unknown")
-        
-        if source_file not in documents:
-            documents[source_file] = {
-                "filename": metadata.get("filename", "Unknown"),
-                "source": source_file,
-                "category": metadata.get("category", "General"),
-                "chunks": [],
-                "confidences": [],
-                "all_content": [],
-                "total_chunks": metadata.get("total_chunks", 1)
-            }
-        
-        # Add chunk to documens{}
-        confidence = round(result.get("score", 0) * 100, 1)
-        documents[source_file]["chunks"].append({
-            "index": metadata.get("chunk_index", 0),
-            "confidence": confidence,
-            "text": result.get("text", "")
-        })
-        documents[source_file]["confidences"].append(confidence)
-        documents[source_file]["all_content"].append(result.get("text", ""))
+    best_score = max([r["score"] for r in knowledge_probe + case_probe], default=0)
     
-    # Calculate document scores and combine content
-    knowledge_docs = []
-    for source_file, doc in documents.items():
-        # Sort chunks by index to maintain order
-        doc["chunks"].sort(key=lambda x: x["index"])
-        doc["all_content"] = [c["text"] for c in doc["chunks"]] 
-        
-        knowledge_docs.append({
-            "filename": doc["filename"],
-            "source": doc["source"],
-            "category": doc["category"],
-            "confidence": max(doc["confidences"]),  # Best chunk score
-            "avg_confidence": round(sum(doc["confidences"]) / len(doc["confidences"]), 1),
-            "content": "\n\n".join(doc["all_content"]),  # Complete document
-            "chunk_count": len(doc["chunks"]),
-            "total_chunks": doc["total_chunks"],
-            "collection": "knowledge_base"
-        })
-
-    # Format special cases
-    special_cases = []
-    for result in case_results:
-        payload = result.get("payload", {})
-        special_cases.append({
-            "filename": f"Case: {payload.get('title', 'Unknown')}",
-            "source": "special_cases",
-            "category": "Special Case",
-            "confidence": round(result.get("score", 0) * 100, 1),
-            "content": f"{payload.get('description', '')}\n\n{payload.get('solution', '')}",
-            "collection": "special_cases",
-            "case_id": payload.get("case_id", "unknown"),
-            "title": payload.get("title", "Unknown"),
-            "author": payload.get("author", "Unknown")
-        })
+    return {
+        "knowledge_results": knowledge_results,
+        "case_results": case_results,
+        "best_score": best_score,
+        "failed": sorted(set(failed))
+    }
 
-    # Combine and sort
-    all_docs = knowledge_docs + special_cases
-    all_docs.sort(key=lambda x: x["confidence"], reverse=True)
+#LLM-PHRASED "NOT FOUND" REPLY (RESPONSE_LLM_PHRASING=true; templates are used otherwise)
+async def suggest_generation(query: str, category: str, best_confidence: float) -> str:
+    """Ask the LLM to phrase the no-match reply and offer generating the document"""
+    # Prepare information about what WAS found
+    found_info = ""
+    if best_confidence > 0:
+        found_info = f"Najlepsze znalezione dopasowanie to tylko {best_confidence}%."
     
-    # SHOW TOP 3 RESULTS
-    print(f"\nTOP 3 DOCUMENTS (full content):")
-    print("=" * 60)
-    for i, doc in enumerate(all_docs[:3], 1):
-        if doc["collection"] == "knowledge_base":
-            print(f"\n{i}. {doc['filename']}")
-            print(f"   Category: {doc['category']}")
-            print(f"   Confidence: {doc['confidence']}% (best chunk)")
-            print(f"   Chunks: {doc['chunk_count']}/{doc['total_chunks']}")
-        else:
-            print(f"\n{i}.{doc['filename']}")
-            print(f"   Confidence: {doc['confidence']}%")
-    print("\n" + "=" * 60)
+    prompt = f"""Użytkownik pyta o: "{query}".
+        {found_info}
+        Przeszukałeś bazę wiedzy w kategorii '{category}' i nie znalazłeś dokumentów z wystarczająco wysokim dopasowaniem (potrzebne >={MIN_CONFIDENCE:g}%).
+        Twoim zadaniem jest:
+        1. Poinformować użytkownika, że nie znalazłeś dobrze dopasowanego dokumentu w obecnej bazie.
+        2. Zapytać użytkownika, czy chce, abyś wygenerował (stworzył) ten dokument teraz.
+        3. Poinstruować go, że jeśli się zgadza, wystarczy że napisze: "Tak, wygeneruj".
+
+        Odpowiedz krótko i konkretnie w języku polskim."""
     
-   
-    return all_docs
+    return await llm_service.agenerate_response(prompt, task="suggest")
 
 #GENERATION INTENT DETECTION - avoid generating documents without user confirmation
 def detect_generation_intent(query: str) -> bool:
@@ -174,17 +200,46 @@ def detect_generation_intent(query: str) -> bool:
     return any(keyword in query_lower for keyword in keywords)
 
 #MAIN SEARCH FUNCTION WITH RAG
-def search_similar_case(query: str) -> Dict[str, Any]:
+async def search_similar_case(query: str, deadline: Deadline = None) -> Dict[str, Any]:
     """
     Enhanced search with RAG and Generation Capability
     Groups chunks by source file, returns full documents
+    Async: Qdrant calls go through the async API, blocking LLM calls run in worker threads
+    Concurrent identical queries (e.g. several tabs or Node-RED retries) with a similar deadline wait on one computation
+    deadline: end-to-end budget (REQUEST_DEADLINE_MS by default); when the answer cannot be generated
+    in time, a degraded response (best document, link, extractive snippet) is returned instead
     """
+    deadline = deadline or Deadline()
+    # The shared run uses the leader's deadline - only requests with a similar budget may join it
+    key = (normalize_query(query), deadline.bucket())
+    return await _search_flight.run(key, lambda: _search_similar_case(query, deadline))
+
+#search pipeline behind the single-flight wrapper
+async def _search_similar_case(query: str, deadline: Deadline) -> Dict[str, Any]:
     global LAST_SEARCH_CONTEXT
     
     try:
         # Check for explicit generation intent
         is_generation = detect_generation_intent(query)
-        category = classify_query_category(query)
+        
+        # Query embedding computed once - shared by the answer cache, retrieval and compression
+        start = time.perf_counter()
+        query_vector = None
+        generation = qdrant_service.index_generation
+        if not is_generation:
+            query_vector = await qdrant_service.aembed(query)
+        
+        # Semantic answer cache - near-duplicate questions skip classification, retrieval and generation
+        if ANSWER_CACHE_ENABLED and not is_generation:
+            cached = answer_cache.lookup(query_vector, generation)
+            if cached:
+                print(f"Answer cache hit (similarity {cached['cache']['similarity']}): '{cached['cache']['cached_query']}'")
+                if cached.get("response_type") == "not_found_suggestion":
+                    LAST_SEARCH_CONTEXT["query"] = query
+                    LAST_SEARCH_CONTEXT["category"] = cached.get("category")
+                return cached
+        
+        category = await asyncio.to_thread(classify_query_category, query, deadline)
         
         # Handle "Confirmation" of generation
         topic_to_generate = query
@@ -203,17 +258,15 @@ def search_similar_case(query: str) -> Dict[str, Any]:
             print(f"Topic used for generation: {topic_to_generate}")
             print(f"Category: {category}")
             
-            file_info = document_generator.generate_document(topic_to_generate, category)
+            file_info = await asyncio.to_thread(document_generator.generate_document, topic_to_generate, category)
             
             if file_info.get("success"):
                 download_url = file_info.get("download_url", "")
                 filename = file_info.get("name", "dokument.docx")
                 
-                response_msg = (
-                    f"Zgodnie z Twoją prośbą wygenerowałem dokument na temat: '{topic_to_generate}'.\n"
-                    f"Został on zapisany w kategorii '{category}'.\n\n"
-                    f"Nazwa pliku: {filename}\n"
-                    f"Link do pobrania: {download_url}"
+                response_msg = response_templates.render(
+                    "generation_success", topic=topic_to_generate, category=category,
+                    filename=filename, download_url=download_url
                 )
                 
                 LAST_SEARCH_CONTEXT = {"query": None, "category": None}
@@ -229,7 +282,7 @@ def search_similar_case(query: str) -> Dict[str, Any]:
             else:
                 return {
                     "found": False,
-                    "message": f"Wystąpił błąd podczas generowania dokumentu: {file_info.get('error')}",
+                    "message": response_templates.render("generation_error", error=file_info.get("error")),
                     "query": query
                 }
 
@@ -238,25 +291,35 @@ def search_similar_case(query: str) -> Dict[str, Any]:
         print(f"Query: '{query}'")
         print(f"LLM Category: {category}")
         
-        # Search knowledge_base with category filter
+        # Search knowledge_base (with category filter) and special_cases in one batched round trip
         if not category or category == ALL_CATEGORIES_KEY:
             print(f"Searching ALL categories for: '{query}'")
-            knowledge_results = qdrant_service.search(query, collection="knowledge_base", limit=200)
         else:
-            print(f"Searching ALL documents in category '{category}' for: '{query}'")
-            knowledge_results = qdrant_service.search_all_in_category(
-                query=query,
-                category=category,
-                collection="knowledge_base"
-            )
-        
-        # Search special_cases
+            print(f"Searching documents in category '{category}' for: '{query}'")
         print(f"Searching special cases for: '{query}'")
-        case_results = qdrant_service.search(query, collection="special_cases", limit=50)
+        
+        try:
+            retrieval = await asyncio.wait_for(
+                retrieve_documents(query, category, query_vector=query_vector), timeout=deadline.remaining_s()
+            )
+        except asyncio.TimeoutError:
+            print(f"Request deadline exceeded during retrieval for: '{query}'")
+            metrics.increment("deadline_exceeded", stage="retrieval")
+            return {
+                "found": False,
+                "message": response_templates.render("deadline_exceeded"),
+                "query": query,
+                "category": category,
+                "response_type": "deadline_exceeded",
+                "deadline": deadline.get_info()
+            }
+        knowledge_results = retrieval["knowledge_results"]
+        case_results = retrieval["case_results"]
+        best_confidence = round(retrieval["best_score"] * 100, 1)
                 
         print(f"Raw results: {len(knowledge_results)} knowledge chunks, {len(case_results)} special cases")
         
-        # group knowledge chunks by source_file
+        # group knowledge chunks by document (doc_id; legacy points without one by source_file)
         documents = {}
         
         for result in knowledge_results:
@@ -264,60 +327,64 @@ def search_similar_case(query: str) -> Dict[str, Any]:
             if not metadata and "payload" in result:
                 metadata = result["payload"].get("metadata", {})
             
-            source_file = metadata.get("source_file", "Unknown")
-            filename = metadata.get("filename", "Unknown")
+            doc_key = metadata.get("doc_id") or metadata.get("source_file", "Unknown")
             
-            if source_file not in documents:
-                documents[source_file] = {
-                    "filename": filename,
-                    "source": source_file,
-                    "category": metadata.get("category", "General"),
+            if doc_key not in documents:
+                documents[doc_key] = {
+                    "doc_id": metadata.get("doc_id"),
+                    "metadata": metadata,
                     "chunks": [],
                     "confidences": [],
-                    "all_content": [],
-                    "total_chunks": metadata.get("total_chunks", 1),
-                    "collection": "knowledge_base"
+                    "all_content": []
                 }
             
             # Add chunk
             confidence = round(result.get("score", 0) * 100, 1)
             chunk_index = metadata.get("chunk_index", 0)
             
-            documents[source_file]["chunks"].append({
+            documents[doc_key]["chunks"].append({
                 "index": chunk_index,
                 "confidence": confidence,
                 "score": result.get("score", 0),
                 "text": result.get("text", "")
             })
-            documents[source_file]["confidences"].append(confidence)
-            documents[source_file]["all_content"].append({
+            documents[doc_key]["confidences"].append(confidence)
+            documents[doc_key]["all_content"].append({
                 "index": chunk_index,
                 "text": result.get("text", "")
             })
         
+        # Document records (full text + document metadata) - one local lookup for all candidates
+        stored_docs = document_store.get_documents([doc["doc_id"] for doc in documents.values()])
+        
         # Build complete documents with chunks in correct order
         knowledge_docs = []
-        for source_file, doc in documents.items():
+        for doc in documents.values():
             # Sort chunks by index
             doc["chunks"].sort(key=lambda x: x["index"])
             doc["all_content"].sort(key=lambda x: x["index"])
             
-            # Combine all text in order
-            full_content = "\n\n".join([c["text"] for c in doc["all_content"]])
+            # Documents ingested before the store existed fall back to the chunk payload and retrieved chunks
+            stored = stored_docs.get(doc["doc_id"]) or {}
+            metadata = doc["metadata"]
+            full_content = stored.get("text") or "\n\n".join([c["text"] for c in doc["all_content"]])
             
             # Calculate document confidence
             max_confidence = max(doc["confidences"]) if doc["confidences"] else 0
             avg_confidence = round(sum(doc["confidences"]) / len(doc["confidences"]), 1) if doc["confidences"] else 0
             
             knowledge_docs.append({
-                "filename": doc["filename"],
-                "source": doc["source"],
-                "category": doc["category"],
+                "filename": stored.get("filename") or metadata.get("filename", "Unknown"),
+                "source": stored.get("source_file") or metadata.get("source_file", "Unknown"),
+                "category": metadata.get("category", "General"),
                 "confidence": max_confidence,
                 "avg_confidence": avg_confidence,
                 "content": full_content,
+                "best_chunk": max(doc["chunks"], key=lambda c: c["score"])["text"] if doc["chunks"] else "",
+                "chunks": doc["chunks"],
                 "chunk_count": len(doc["chunks"]),
-                "total_chunks": doc["total_chunks"],
+                "total_chunks": stored.get("total_chunks") or metadata.get("total_chunks", 1),
+                "doc_id": doc["doc_id"],
                 "collection": "knowledge_base",
                 "type": "Document"
             })
@@ -352,6 +419,13 @@ def search_similar_case(query: str) -> Dict[str, Any]:
         all_docs = knowledge_docs + special_cases
         all_docs.sort(key=lambda x: x["confidence"], reverse=True)
         
+        # Optional cross-encoder rerank of the top grouped candidates
+        rerank_info = None
+        if RERANK_ENABLED and deadline.allows("rerank", DEADLINE_ANSWER_MIN_MS):
+            rerank_info = await reranker.arerank(query, all_docs, budget_ms=deadline.remaining_ms() - DEADLINE_ANSWER_MIN_MS)
+            all_docs = rerank_info.pop("docs")
+            print(f"Rerank: applied={rerank_info['applied']}, {rerank_info['latency_ms']} ms, top-1 changed={rerank_info['top1_changed']}")
+        
         # DISPLAY TOP 3 RESULTS
     
         print("TOP 3 MOST RELEVANT DOCUMENTS")
@@ -378,41 +452,38 @@ def search_similar_case(query: str) -> Dict[str, Any]:
         print(f"Znaleziono {len(all_docs)} dokumentów")
         
         # Check if we have good matches
-        good_matches = [doc for doc in all_docs if doc["confidence"] >= 35]
+        good_matches = [doc for doc in all_docs if doc["confidence"] >= MIN_CONFIDENCE]
         
         if not good_matches:
-            print(f"\nBrak dokumentów z dobrym dopasowaniem (najlepsze: {all_docs[0]['confidence'] if all_docs else 0}%)")
+            print(f"\nBrak dokumentów z dobrym dopasowaniem (najlepsze: {best_confidence}%)")
             
             # SAVE CONTEXT for potential generation
             LAST_SEARCH_CONTEXT["query"] = query
             LAST_SEARCH_CONTEXT["category"] = category
             
-            # Prepare information about what WAS found
-            found_info = ""
-            if all_docs:
-                found_info = f"Znalazłem {len(all_docs)} dokumentów, ale najlepsze dopasowanie to tylko {all_docs[0]['confidence']}%."
-            
-            prompt = f"""Użytkownik pyta o: "{query}".
-        {found_info}
-        Przeszukałeś bazę wiedzy w kategorii '{category}' i nie znalazłeś dokumentów z wystarczająco wysokim dopasowaniem (potrzebne >=35%).
-        Twoim zadaniem jest:
-        1. Poinformować użytkownika, że nie znalazłeś dobrze dopasowanego dokumentu w obecnej bazie.
-        2. Zapytać użytkownika, czy chce, abyś wygenerował (stworzył) ten dokument teraz.
-        3. Poinstruować go, że jeśli się zgadza, wystarczy że napisze: "Tak, wygeneruj".
-
-        Odpowiedz krótko i konkretnie w języku polskim."""
-                    
-            suggestion_response = llm_service.generate_response(prompt, temperature=0.3)
+            # Deterministic reply from a template; LLM phrasing only when explicitly enabled
+            if RESPONSE_LLM_PHRASING:
+                suggestion_response = await suggest_generation(query, category, best_confidence)
+            else:
+                suggestion_response = response_templates.render_not_found(query, category, best_confidence)
             
-            return {
+            result = {
                 "found": False,
                 "message": suggestion_response,
                 "query": query,
                 "category": category,
                 "total_documents": len(all_docs),
-                "best_confidence": all_docs[0]["confidence"] if all_docs else 0,
+                "best_confidence": best_confidence,
                 "response_type": "not_found_suggestion"
             }
+            if retrieval["failed"]:
+                # Empty results from a failed search are not a real "no match" - don't pin them in the cache
+                result["retrieval_failed"] = retrieval["failed"]
+                metrics.increment("retrieval_failed")
+            elif ANSWER_CACHE_ENABLED and not suggestion_response.startswith(LLM_ERROR_PREFIX):
+                answer_cache.put(query, query_vector, result, generation,
+                                 latency_ms=(time.perf_counter() - start) * 1000)
+            return result
         
         # Use the best document for response
         best_doc = good_matches[0]
@@ -423,26 +494,75 @@ def search_similar_case(query: str) -> Dict[str, Any]:
         print(f"   Długość treści: {len(best_doc['content'])} znaków")
         print(f"{'='*60}\n")
         
-        # Build prompt with complete document
-        prompt = build_document_prompt(query, best_doc, category)
+        # Not enough budget left for an LLM answer - answer from the document itself
+        if not deadline.allows("answer", DEADLINE_ANSWER_MIN_MS):
+            return build_degraded_response(query, best_doc, category, "deadline", deadline)
+        
+        # Pack the highest-value chunks of the top knowledge documents into the token budget
+        packed, num_ctx = None, None
+        if CONTEXT_PACKING and best_doc["collection"] == "knowledge_base":
+            # Token counting is CPU-bound (and loads the tokenizer if warm-up did not) - keep it off the event loop
+            packed = await asyncio.to_thread(
+                context_packer.pack, [doc for doc in good_matches if doc["collection"] == "knowledge_base"]
+            )
+            num_ctx = context_packer.num_ctx(llm_service.route("answer")["options"]["num_predict"])
+            print(f"   Kontekst: {packed['tokens']}/{packed['budget']} tokenów, {packed['chunks_used']}/{packed['chunks_total']} chunków z {len(packed['documents'])} dokumentów")
+        
+        # Keep only the sentences relevant to the query (no retrieval round trip - reuses the query embedding)
+        context = packed["context"] if packed else None
+        compression = None
+        if COMPRESSION_ENABLED and best_doc["collection"] == "knowledge_base":
+            compression = await compressor.acompress(context if context is not None else best_doc["content"], query_vector)
+            context = compression.pop("text")
+            print(f"   Kompresja: {compression['original_chars']} -> {compression['compressed_chars']} znaków ({compression['ratio']}), {compression['latency_ms']} ms")
+        
+        # Build prompt with packed / compressed context (or the complete document)
+        system, prompt = build_document_prompt(query, best_doc, category, context=context)
         
         # Generate response
-        response = llm_service.generate_response(prompt)
+        llm_result = await llm_service.agenerate_result(prompt, num_ctx=num_ctx, task="answer", system=system,
+                                                        deadline=deadline)
+        response = llm_result.text
+        if llm_result.error:
+            return build_degraded_response(query, best_doc, category, "deadline" if deadline.expired() else "llm_error", deadline)
         
         # Parse response
-        result = parse_rag_response(response, [best_doc])
+        result = parse_rag_response(response, packed["documents"] if packed else [best_doc])
         
         # Add metadata
         result["query"] = query
         result["category"] = category
         result["total_documents"] = len(all_docs)
         result["good_matches"] = len(good_matches)
+        result["llm"] = llm_result.to_dict()
+        if rerank_info:
+            result["rerank"] = rerank_info
+        if compression:
+            result["compression"] = compression
+        if packed:
+            result["context"] = {
+                "tokens": packed["tokens"],
+                "budget": packed["budget"],
+                "chunks_used": packed["chunks_used"],
+                "chunks_total": packed["chunks_total"],
+                "tokenizer": packed["tokenizer"],
+                "documents": len(packed["documents"]),
+                "num_ctx": num_ctx
+            }
         result["document_used"] = {
             "filename": best_doc["filename"],
             "confidence": best_doc["confidence"],
             "source": best_doc.get("source", "").replace("/app/qdrant_data/", "data/")
         }
         
+        # Cache keyed to the document version the answer was built from
+        if ANSWER_CACHE_ENABLED and not response.startswith(LLM_ERROR_PREFIX):
+            doc_id = best_doc.get("doc_id")
+            stored = document_store.get_document(doc_id) if doc_id else None
+            answer_cache.put(query, query_vector, result, generation,
+                             doc_id=doc_id if stored else None, doc_hash=stored["file_hash"] if stored else None,
+                             latency_ms=(time.perf_counter() - start) * 1000)
+        
         return result
         
     except Exception as e:
@@ -455,36 +575,63 @@ def search_similar_case(query: str) -> Dict[str, Any]:
             "query": query
         }
 
+#EXTRACTIVE SNIPPET - leading sentences of the best-matching chunk, cut at a sentence boundary
+def extract_snippet(document: Dict[str, Any], max_chars: int = DEADLINE_SNIPPET_CHARS) -> str:
+    text = " ".join((document.get("best_chunk") or document.get("solution") or document.get("content", "")).split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    return cut[:boundary + 1] if boundary > max_chars // 3 else cut.rstrip() + "..."
+
+#DEGRADED RESPONSE - no LLM answer in time (or LLM failure): best document, its link and a snippet
+def build_degraded_response(query: str, best_doc: Dict[str, Any], category: str, reason: str,
+                            deadline: Deadline) -> Dict[str, Any]:
+    path = best_doc.get("source", "").replace("/app/qdrant_data/", "data/")
+    link = f"/{path}" if best_doc.get("collection") == "knowledge_base" else None
+    template = "degraded_answer" if reason == "deadline" else "degraded_answer_error"
+    message = response_templates.render(
+        template, filename=best_doc.get("filename", "Unknown"), confidence=best_doc.get("confidence", 0),
+        snippet=extract_snippet(best_doc), link=link or "brak (przypadek specjalny)"
+    )
+    print(f"Degraded response ({reason}) for: '{query}' → {best_doc.get('filename')}")
+    metrics.increment("degraded_responses", reason=reason)
+    
+    result = parse_rag_response(message, [best_doc])
+    result["query"] = query
+    result["category"] = category
+    result["response_type"] = "degraded"
+    result["degraded"] = {"reason": reason, "link": link}
+    result["deadline"] = deadline.get_info()
+    result["document_used"] = {
+        "filename": best_doc["filename"],
+        "confidence": best_doc["confidence"],
+        "source": path
+    }
+    return result
+
 #PROMPT BUILDING b(ased on document type - knowledge_base, special_cases, no info)
-def build_document_prompt(query: str, document: Dict[str, Any], category: str = None) -> str:
+def build_document_prompt(query: str, document: Dict[str, Any], category: str = None, context: str = None) -> Tuple[str, str]:
     """
-    Build prompt with single complete document
+    Build (system, prompt) for a single complete document (or a packed context of several documents, see context_packer)
     Trzy przypadki: knowledge_base, special_cases, brak informacji
+    Order: fixed system prefix -> document -> question, so repeated documents also share a cacheable prefix
     """
     file_path = document.get("source", "").replace("/app/qdrant_data/", "data/")
     doc_type = document.get("collection", "knowledge_base")
     
     #KNOWLEDGE_BASE
     if doc_type == "knowledge_base":
-        return f"""Jesteś asystentem Biura Obsługi Studenta. Pomagasz pracownikom dziekanatu.
-
-PYTANIE: "{query}"
-
-DOKUMENT ŹRÓDŁOWY:
+        return KNOWLEDGE_SYSTEM_PROMPT, f"""DOKUMENT ŹRÓDŁOWY:
 Plik: {document['filename']}
 Ścieżka: {file_path}
 Kategoria: {document.get('category', 'unknown')}
 Dopasowanie: {document['confidence']}%
 
 TREŚĆ DOKUMENTU:
-{document['content']}
+{document['content'] if context is None else context}
 
-INSTRUKCJE:
-1. Odpowiedz na pytanie WYŁĄCZNIE na podstawie tego dokumentu.
-2. Odpowiadaj po polsku.
-3. NIE cytuj dosłownie formularza (nie wypisuj pól).
-4. Jeśli to formularz/wniosek - wyjaśnij do czego służy i gdzie go złożyć.
-5. Na końcu podaj link i dopasowanie.
+PYTANIE: "{query}"
 
 ODPOWIEDŹ:"""
     
@@ -498,22 +645,13 @@ ODPOWIEDŹ:"""
         else:
             created_date = "brak daty"
         
-        return f"""Jesteś asystentem Biura Obsługi Studenta. Pomagasz pracownikom dziekanatu.
-
-PYTANIE: "{query}"
-
-ZNALEZIONY PRZYPADEK HISTORYCZNY:
+        return SPECIAL_CASE_SYSTEM_PROMPT, f"""ZNALEZIONY PRZYPADEK HISTORYCZNY:
 Tytuł: {document.get('title', 'unknown')}
 Opis: {document.get('description', 'Brak opisu')}
 Rozwiązanie: {document.get('solution', 'Brak rozwiązania')}
 Dopasowanie: {document['confidence']}%
 
-INSTRUKCJE:
-1. To jest historyczny przypadek rozwiązania podobnego problemu.
-2. Wyjaśnij dlaczego ten przypadek pasuje do pytania.
-3. Opisz jak rozwiązano ten przypadek.
-4. Odpowiadaj po polsku.
-5. Użyj formatu z poniższego przykładu.
+PYTANIE: "{query}"
 
 ODPOWIEDŹ:
 ---
@@ -530,17 +668,10 @@ Uwagi: {document.get('notes', document.get('additional_notes', 'Brak uwag'))}
     
     # PRZYPADEK 3: BRAK INFORMACJI (gdy dokument jest None lub nieznany typ)
     else:
-        return f"""Jesteś asystentem Biura Obsługi Studenta.
-
-PYTANIE: "{query}"
+        return NO_INFO_SYSTEM_PROMPT, f"""PYTANIE: "{query}"
 
 Nie znaleziono odpowiednich dokumentów w bazie wiedzy.
 
-INSTRUKCJE:
-1. Poinformuj użytkownika, że nie znaleziono informacji.
-2. Zaproponuj wygenerowanie nowego dokumentu.
-3. Odpowiadaj po polsku.
-
 ODPOWIEDŹ:
 Nie posiadam informacji na ten temat w aktualnej bazie wiedzy.
 
@@ -549,7 +680,7 @@ Czy chcesz, abym wygenerował dokument z procedurą?"""
 #RAG RESPONSE PARSING - extract sources, confidence, check if info found
 def parse_rag_response(raw_response: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
-    Parse response with single document
+    Parse response; documents = the document(s) the prompt was built from, best first
     """
     raw_response = raw_response.strip()
     
@@ -563,8 +694,7 @@ def parse_rag_response(raw_response: str, documents: List[Dict[str, Any]]) -> Di
     file_paths = []
     similarity = 0
     
-    if documents:
-        doc = documents[0]
+    for doc in documents:
         source_path = doc.get("source", "")
         user_path = source_path.replace("/app/qdrant_data/", "data/")
         
@@ -576,7 +706,9 @@ def parse_rag_response(raw_response: str, documents: List[Dict[str, Any]]) -> Di
         })
         
         file_paths.append(user_path)
-        similarity = doc.get("confidence", 0)
+    
+    if documents:
+        similarity = documents[0].get("confidence", 0)
     
     return {
         "found": found,
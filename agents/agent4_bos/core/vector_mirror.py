@@ -0,0 +1,265 @@
+#imports
+import time
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional
+from .config import VECTOR_MIRROR_DTYPE, VECTOR_MIRROR_SERVE, ALL_CATEGORIES_KEY
+from .metrics import metrics
+
+#class: MirrorSegment - one collection held as a contiguous matrix plus compact id/category arrays
+class MirrorSegment:
+    def __init__(self, dim: int = 384, dtype: str = VECTOR_MIRROR_DTYPE, capacity: int = 1024):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self.vectors = np.zeros((capacity, dim), dtype=self.dtype)
+        self.categories = np.full(capacity, -1, dtype=np.int16)
+        self.ids = []
+        self.payloads = []
+        self.row_of = {}  # point id -> row
+        self.category_codes = {}  # category name -> code
+
+    #method: grow the arrays (capacity doubling keeps appends amortized O(1))
+    def _grow(self):
+        capacity = len(self.vectors) * 2
+        vectors = np.zeros((capacity, self.dim), dtype=self.dtype)
+        vectors[:self.size] = self.vectors[:self.size]
+        categories = np.full(capacity, -1, dtype=np.int16)
+        categories[:self.size] = self.categories[:self.size]
+        self.vectors, self.categories = vectors, categories
+
+    #method: category name -> compact code
+    def _category_code(self, category: Optional[str]) -> int:
+        if category is None:
+            return -1
+        if category not in self.category_codes:
+            self.category_codes[category] = len(self.category_codes)
+        return self.category_codes[category]
+
+    #method: insert or overwrite one point (vectors stored L2-normalized, so dot product = cosine)
+    def upsert(self, point_id: str, vector, payload: Dict[str, Any]):
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        row = self.row_of.get(point_id)
+        if row is None:
+            if self.size == len(self.vectors):
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.row_of[point_id] = row
+            self.ids.append(point_id)
+            self.payloads.append(payload)
+        else:
+            self.payloads[row] = payload
+        self.vectors[row] = vector
+        self.categories[row] = self._category_code((payload.get("metadata") or {}).get("category"))
+
+    #method: memory held by the arrays
+    def nbytes(self) -> int:
+        return self.vectors[:self.size].nbytes + self.categories[:self.size].nbytes
+
+
+#class: VectorMirror - optional in-process copy of the served collections (brute-force search, Qdrant fallback)
+class VectorMirror:
+    def __init__(self, serve: bool = VECTOR_MIRROR_SERVE):
+        self.serve = serve
+        self._segments = {}
+        self._lock = threading.Lock()
+
+        # collection -> points upserted while a rebuild is scrolling (replayed after it finishes)
+        self._pending = {}
+        self._rebuild_lock = threading.Lock()
+        self.built_at = {}
+
+    #method: true when a collection is loaded and can answer searches
+    def ready(self, collection: str) -> bool:
+        return collection in self._segments
+
+    #method: true when dense searches on a collection should skip Qdrant entirely
+    def serving(self, collection: str) -> bool:
+        return self.serve and self.ready(collection)
+
+    # SYNC HOOKS - called by QdrantService on writes to a served (aliased) collection
+
+    #method: ingestion hook - points written to the served collection
+    def on_upsert(self, collection: str, points: List[Dict[str, Any]]):
+        """points: [{"id", "vector", "payload"}]"""
+        with self._lock:
+            if collection in self._pending:
+                self._pending[collection].extend(points)
+            segment = self._segments.get(collection)
+            if segment is None:
+                return
+            for point in points:
+                segment.upsert(point["id"], point["vector"], point["payload"])
+
+    #method: alias swapped or collection cleared - reload in the background
+    def on_reset(self, collection: str):
+        # Collections not loaded yet wait for the initial rebuild_all() (main.py startup)
+        if self.ready(collection):
+            threading.Thread(target=self.rebuild, args=(collection,), daemon=True).start()
+
+    #method: load a collection from Qdrant into a fresh segment, then swap it in
+    def rebuild(self, collection: str) -> Dict[str, Any]:
+        with self._rebuild_lock:
+            return self._rebuild(collection)
+
+    #method: one rebuild (callers hold _rebuild_lock)
+    def _rebuild(self, collection: str) -> Dict[str, Any]:
+        from .qdrant_service import qdrant_service
+
+        start = time.perf_counter()
+        with self._lock:
+            self._pending[collection] = []
+
+        segment = MirrorSegment()
+        try:
+            for point_id, vector, payload in qdrant_service.iter_vectors(collection):
+                segment.upsert(point_id, vector, payload)
+        except Exception as e:
+            print(f"Vector mirror rebuild of {collection} failed: {e}")
+            with self._lock:
+                self._pending.pop(collection, None)
+            return {"status": "error", "collection": collection, "message": str(e)}
+
+        with self._lock:
+            for point in self._pending.pop(collection, []):
+                segment.upsert(point["id"], point["vector"], point["payload"])
+            self._segments[collection] = segment
+            self.built_at[collection] = time.time()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"Vector mirror: {collection} loaded ({segment.size} points, {segment.nbytes() / 1e6:.1f} MB, {elapsed_ms:.0f} ms)")
+        return {"status": "success", "collection": collection, "points": segment.size, "build_ms": round(elapsed_ms, 1)}
+
+    #method: load every collection
+    def rebuild_all(self) -> Dict[str, Any]:
+        from .qdrant_service import qdrant_service
+        return {collection: self.rebuild(collection) for collection in qdrant_service.collections}
+
+    # SEARCH
+
+    #method: brute-force search of one collection
+    def search(self, query_vector, collection: str, limit: int = 5, category: str = None,
+               score_threshold: float = None) -> List[Dict[str, Any]]:
+        """
+        Scores = normalized matrix @ normalized query; category filter is a mask over the code array,
+        top-k uses argpartition (O(n)) and only the k winners are sorted.
+        """
+        segment = self._segments.get(collection)
+        if segment is None or limit <= 0:
+            return []
+
+        # Snapshot under the lock; a concurrent grow replaces the arrays, it never mutates these views
+        with self._lock:
+            size = segment.size
+            vectors = segment.vectors[:size]
+            categories = segment.categories[:size]
+            ids, payloads = segment.ids, segment.payloads
+            code = segment.category_codes.get(category) if category and category != ALL_CATEGORIES_KEY else None
+
+        if size == 0 or (category and category != ALL_CATEGORIES_KEY and code is None):
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = (vectors @ query.astype(vectors.dtype)).astype(np.float32)
+
+        if code is not None:
+            scores = np.where(categories == code, scores, -np.inf)
+        if score_threshold is not None:
+            scores = np.where(scores >= score_threshold, scores, -np.inf)
+
+        k = min(limit, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for row in top:
+            score = float(scores[row])
+            if score == -np.inf:
+                break
+            payload = payloads[row]
+            results.append({
+                "id": ids[row],
+                "score": score,
+                "text": payload.get("text", ""),
+                "metadata": payload.get("metadata", {}),
+                "collection": collection,
+                "source": "vector_mirror",
+                "payload": payload
+            })
+        return results
+
+    #method: run search_batch-style sub-queries (dense only; "filter" and hybrid legs are not supported)
+    def search_batch(self, query_vector, subqueries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        with metrics.timer("vector_mirror_search_ms"):
+            return [
+                self.search(query_vector, subquery.get("collection", "knowledge_base"), subquery.get("limit", 5),
+                            subquery.get("category"), subquery.get("score_threshold"))
+                for subquery in subqueries
+            ]
+
+    #method: summary for /metrics
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "serve": self.serve,
+            "collections": {
+                collection: {
+                    "points": segment.size,
+                    "dtype": str(segment.dtype),
+                    "megabytes": round(segment.nbytes() / 1e6, 2),
+                    "built_at": self.built_at.get(collection)
+                }
+                for collection, segment in self._segments.items()
+            }
+        }
+
+    #method: compare mirror and Qdrant latency / top-k agreement on sample queries
+    def benchmark(self, queries: List[str], collection: str = "knowledge_base", limit: int = 10, rounds: int = 3) -> Dict[str, Any]:
+        from .qdrant_service import qdrant_service
+
+        if not self.ready(collection):
+            return {"status": "error", "message": f"{collection} is not loaded in the mirror"}
+
+        qdrant_ms, mirror_ms, overlap = [], [], []
+        for query in queries:
+            query_vector = qdrant_service.embedder.encode(query).tolist()
+            for _ in range(rounds):
+                start = time.perf_counter()
+                qdrant_hits = qdrant_service.client.search(
+                    collection_name=qdrant_service.collections[collection],
+                    query_vector=query_vector, limit=limit, with_payload=False
+                )
+                qdrant_ms.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                mirror_hits = self.search(query_vector, collection, limit)
+                mirror_ms.append((time.perf_counter() - start) * 1000)
+
+            expected = {str(hit.id) for hit in qdrant_hits}
+            overlap.append(len(expected & {hit["id"] for hit in mirror_hits}) / len(expected) if expected else 1.0)
+
+        def summary(values):
+            ordered = sorted(values)
+            return {
+                "avg_ms": round(sum(ordered) / len(ordered), 3),
+                "p50_ms": round(ordered[len(ordered) // 2], 3),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3)
+            }
+
+        return {
+            "status": "success",
+            "collection": collection,
+            "points": self._segments[collection].size,
+            "queries": len(queries),
+            "rounds": rounds,
+            "limit": limit,
+            "qdrant": summary(qdrant_ms),
+            "mirror": summary(mirror_ms),
+            "recall_at_k": round(sum(overlap) / len(overlap), 4) if overlap else None
+        }
+
+
+# Singleton instance
+vector_mirror = VectorMirror()
@@ -0,0 +1,143 @@
+#imports
+import time
+import threading
+from typing import Dict, Any
+from .config import WARMUP_ENABLED, LLM_KEEP_ALIVE, LLM_KEEP_ALIVE_INTERVAL, RERANK_ENABLED, CONTEXT_PACKING
+from .metrics import metrics
+
+# Readiness steps; GET /ready is true once all of them are done
+READINESS_STEPS = ("models", "embedder", "index")
+
+#class: Warmup - startup warm-up of Ollama models and local encoders, readiness state and background keep-alive
+class Warmup:
+    def __init__(self, enabled: bool = WARMUP_ENABLED, keep_alive: str = LLM_KEEP_ALIVE,
+                 keep_alive_interval: float = LLM_KEEP_ALIVE_INTERVAL):
+        self.enabled = enabled
+        self.keep_alive = keep_alive
+        self.keep_alive_interval = keep_alive_interval
+        self._lock = threading.Lock()
+        self._steps = {step: {"done": False, "latency_ms": None, "error": None} for step in READINESS_STEPS}
+        self._models = {}  # model -> {"loaded", "load_ms", "last_ping", "error"}
+        self._keep_alive_thread = None
+        self._started_at = time.time()
+
+    #method: record a finished readiness step
+    def mark(self, step: str, latency_ms: float = None, error: str = None):
+        with self._lock:
+            self._steps[step] = {
+                "done": error is None,
+                "latency_ms": round(latency_ms, 1) if latency_ms is not None else None,
+                "error": error
+            }
+
+    #property: all readiness steps done
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(step["done"] for step in self._steps.values())
+
+    #method: preload every configured model (zero-token generate, pinned with keep_alive)
+    def warm_models(self) -> bool:
+        from .llm_service import llm_service
+
+        start = time.perf_counter()
+        failed = []
+        for model in llm_service.models():
+            try:
+                load_ms = llm_service.preload(model, keep_alive=self.keep_alive)
+                metrics.observe("warmup_model_load_ms", load_ms, model=model)
+                print(f"Warm-up: model {model} loaded in {load_ms:.0f} ms (keep_alive={self.keep_alive})")
+                self._set_model(model, loaded=True, load_ms=round(load_ms, 1), error=None)
+            except Exception as e:
+                print(f"Warm-up: could not load model {model}: {e}")
+                self._set_model(model, loaded=False, error=str(e))
+                failed.append(model)
+
+        self.mark("models", (time.perf_counter() - start) * 1000, f"failed: {', '.join(failed)}" if failed else None)
+        return not failed
+
+    #method: one forward pass through the embedder (and the reranker when enabled) to initialise kernels,
+    #        plus the context packer tokenizer, so no request downloads or loads it
+    def warm_embedder(self) -> bool:
+        from .qdrant_service import qdrant_service
+
+        start = time.perf_counter()
+        try:
+            qdrant_service.embedder.encode(["rozgrzewka modelu"])
+            if RERANK_ENABLED:
+                from .reranker import reranker
+                reranker._get_model().predict([("rozgrzewka", "modelu")])
+            if CONTEXT_PACKING:
+                from .context_packer import context_packer
+                if not context_packer.counter.load():
+                    print("Warm-up: context packer tokenizer unavailable - token counts are estimates")
+        except Exception as e:
+            print(f"Warm-up: embedder forward pass failed: {e}")
+            self.mark("embedder", error=str(e))
+            return False
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        print(f"Warm-up: embedder ready in {latency_ms:.0f} ms")
+        self.mark("embedder", latency_ms)
+        return True
+
+    #method: full warm-up (models are retried by the keep-alive loop if Ollama is not up yet)
+    def run(self):
+        if not self.enabled:
+            self.mark("models")
+            self.mark("embedder")
+            return
+        self.warm_embedder()
+        self.warm_models()
+        self.start_keep_alive()
+
+    #method: start the background keep-alive thread
+    def start_keep_alive(self):
+        if self.keep_alive_interval <= 0 or self._keep_alive_thread is not None:
+            return
+        self._keep_alive_thread = threading.Thread(target=self._keep_alive_loop, daemon=True, name="llm-keep-alive")
+        self._keep_alive_thread.start()
+
+    #method: re-pin every model before its keep_alive expires (also finishes a failed startup warm-up)
+    def _keep_alive_loop(self):
+        from .llm_service import llm_service
+
+        while True:
+            time.sleep(self.keep_alive_interval)
+            if not self._steps["models"]["done"]:
+                self.warm_models()
+                continue
+            for model in llm_service.models():
+                try:
+                    llm_service.preload(model, keep_alive=self.keep_alive, timeout=60)
+                    self._set_model(model, loaded=True, error=None)
+                    metrics.increment("llm_keep_alive_pings", model=model)
+                except Exception as e:
+                    print(f"Keep-alive: model {model} ping failed: {e}")
+                    self._set_model(model, loaded=False, error=str(e))
+                    metrics.increment("llm_keep_alive_failures", model=model)
+
+    #method: update per-model state
+    def _set_model(self, model: str, **state):
+        with self._lock:
+            entry = self._models.setdefault(model, {"loaded": False, "load_ms": None, "last_ping": None, "error": None})
+            entry.update(state)
+            entry["last_ping"] = time.time()
+
+    #method: readiness report for GET /ready
+    def get_info(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {name: dict(step) for name, step in self._steps.items()}
+            models = {name: dict(state) for name, state in self._models.items()}
+        return {
+            "ready": all(step["done"] for step in steps.values()),
+            "uptime_seconds": round(time.time() - self._started_at, 1),
+            "steps": steps,
+            "models": models,
+            "keep_alive": self.keep_alive,
+            "keep_alive_interval": self.keep_alive_interval
+        }
+
+
+# Singleton instance
+warmup = Warmup()
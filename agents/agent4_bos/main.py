@@ -6,33 +6,31 @@ import os
 
 # Run the full ingestion once at startup (knowledge base + special cases)
 def run_startup_ingestion():
-    """Run ingestion of both knowledge base and special cases on startup"""
+    """Rebuild both collections on startup into new versions; the serving collections stay live until the alias swap"""
+    from core.warmup import warmup
+    start = time.perf_counter()
     try:
 
         from core.document_ingestor import document_ingestor
         from core.qdrant_service import qdrant_service
         
-        # Clear collection contents
-        print("\nStep 1: Clearing collection CONTENTS")
-        qdrant_service.clear_all_collections(delete_structure=False)
-        
         # Check if folders exist
         from core.config import KNOWLEDGE_BASE_PATH, SPECIAL_CASES_PATH
         
-        print(f"\nStep 2: Checking data paths")
+        print(f"\nStep 1: Checking data paths")
         print(f"Knowledge base: {KNOWLEDGE_BASE_PATH} - Exists: {os.path.exists(KNOWLEDGE_BASE_PATH)}")
         print(f"Special cases: {SPECIAL_CASES_PATH} - Exists: {os.path.exists(SPECIAL_CASES_PATH)}")
         
 
-        # Ingest knowledge base
-        print("\n Ingesting knowledge base documents")
-        kb_result = document_ingestor.ingest_knowledge_base()
-        print(f"     Result: {kb_result['stats']['processed_files']} files, {kb_result['stats']['total_chunks']} chunks")
+        # Reindex knowledge base (new version, validated, alias swapped)
+        print("\nStep 2: Reindexing knowledge base documents")
+        kb_result = document_ingestor.reindex("knowledge_base")
+        print(f"     Result: {kb_result['status']}, {kb_result['stats']['processed_files']} files, {kb_result['stats']['total_chunks']} chunks")
         
-        # Ingest special cases
-        print("\n Ingesting special cases documents")
-        sc_result = document_ingestor.ingest_special_cases()
-        print(f"     Result: {sc_result['stats']['processed_files']} files, {sc_result['stats']['total_chunks']} chunks")
+        # Reindex special cases
+        print("\nStep 3: Reindexing special cases documents")
+        sc_result = document_ingestor.reindex("special_cases")
+        print(f"     Result: {sc_result['status']}, {sc_result['stats']['processed_files']} files, {sc_result['stats']['total_chunks']} chunks")
         
         
         total_files = kb_result['stats']['processed_files'] + sc_result['stats']['processed_files']
@@ -44,17 +42,33 @@ def run_startup_ingestion():
         print(f"  Knowledge base: {kb_result['stats']['total_chunks']} chunks")
         print(f"  Special cases: {sc_result['stats']['total_chunks']} chunks")
         
+        # Load the optional in-process vector mirror from the freshly served collections
+        if qdrant_service.vector_mirror:
+            print("\nStep 4: Loading in-process vector mirror")
+            for collection, result in qdrant_service.vector_mirror.rebuild_all().items():
+                print(f"     {collection}: {result['status']}, {result.get('points', 0)} points")
+        
         # check Qdrant
         try:
             info = qdrant_service.get_database_info()
             print("\nQdrant Collections:")
             for col_name, col_info in info['collections'].items():
                 print(f"  {col_name}: {col_info['count']} documents")
+            # A failed reindex keeps the old (possibly empty) version serving - not ready
+            failed = [f"{name}: {result.get('message', 'reindex failed')}"
+                      for name, result in (("knowledge_base", kb_result), ("special_cases", sc_result))
+                      if result['status'] == "error"]
+            if failed:
+                warmup.mark("index", (time.perf_counter() - start) * 1000, "; ".join(failed))
+            else:
+                warmup.mark("index", (time.perf_counter() - start) * 1000)
         except Exception as e:
             print(f"\nCould not check Qdrant: {e}")
+            warmup.mark("index", error=str(e))
     
         
     except Exception as e:
+        warmup.mark("index", error=str(e))
         print(f"\nERROR in startup ingestion: {e}")
         import traceback
         traceback.print_exc()
@@ -73,6 +87,18 @@ def start_background_watcher():
         print(f"Could not start file watcher: {e}")
         return None
 
+# Preload Ollama models, run one embedding forward pass and start the keep-alive pings
+def start_warmup():
+    """Start startup warm-up in a background thread"""
+    try:
+        from core.warmup import warmup
+        warmup_thread = threading.Thread(target=warmup.run, daemon=True)
+        warmup_thread.start()
+        return warmup_thread
+    except Exception as e:
+        print(f"Could not start warm-up: {e}")
+        return None
+
 if __name__ == "__main__":
     print("=" * 60)
     print("Starting Agent4 BOS RAG System")
@@ -87,8 +113,9 @@ if __name__ == "__main__":
     print("Starting file watcher")
     watcher_thread = start_background_watcher()
     
-    # Give ingestion a moment to start
-    time.sleep(3)
+    # Warm up models and encoders in the background; GET /ready gates traffic until it finishes
+    print("Starting model warm-up")
+    warmup_thread = start_warmup()
     
     print("\nStarting FastAPI server")
     print(f"Server will be available at: http://0.0.0.0:8000")
@@ -0,0 +1,11 @@
+#imports
+import os
+import sys
+import tempfile
+
+# Run from agents/agent4_bos/tests: make "core", "api" and "app" importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the SQLite stores and data folders out of /app (config reads this on import)
+os.environ.setdefault("BASE_DATA_PATH", tempfile.mkdtemp(prefix="agent4_bos_test_"))
+os.environ.setdefault("STORAGE_PATH", tempfile.mkdtemp(prefix="agent4_bos_test_storage_"))
@@ -0,0 +1,29 @@
+#imports
+import pytest
+
+from core.config import CONTEXT_TOKENIZER
+from core.context_packer import TokenCounter
+
+
+def test_tokenizer_loads_with_pinned_stack():
+    pytest.importorskip("transformers")
+    # Fails when the installed transformers/tokenizers cannot read the target model's tokenizer.json
+    counter = TokenCounter()
+    assert counter.load()
+    assert counter.source == CONTEXT_TOKENIZER
+
+
+def test_counts_come_from_tokenizer():
+    pytest.importorskip("transformers")
+    counter = TokenCounter()
+    assert counter.load()
+    text = "Wniosek o urlop dziekański należy złożyć w dziekanacie."
+    assert 0 < counter.count(text) < len(text)
+    assert counter.truncate(text, 3) != text
+
+
+def test_estimate_without_tokenizer():
+    counter = TokenCounter(tokenizer_name="", chars_per_token=3.0)
+    assert not counter.load()
+    assert counter.source == "estimate"
+    assert counter.count("a" * 30) == 10
@@ -0,0 +1,26 @@
+#imports
+import pytest
+
+from core.config import REQUEST_DEADLINE_MS, REQUEST_DEADLINE_MAX_MS
+from core.deadline import Deadline
+from core.response_templates import response_templates
+
+
+@pytest.mark.parametrize("value", [None, "", "abc", "nan", "NaN", "inf", "-inf"])
+def test_from_header_falls_back_to_default(value):
+    assert Deadline.from_header(value).budget_ms == REQUEST_DEADLINE_MS
+
+
+def test_from_header_clamps_to_range():
+    assert Deadline.from_header("-5").budget_ms == 0.0
+    assert Deadline.from_header(str(REQUEST_DEADLINE_MAX_MS * 10)).budget_ms == REQUEST_DEADLINE_MAX_MS
+    assert Deadline.from_header("1500").budget_ms == 1500.0
+
+
+def test_degraded_wording_depends_on_reason():
+    values = {"filename": "a.docx", "confidence": 80.0, "snippet": "...", "link": "/data/a.docx"}
+    deadline_text = response_templates.render("degraded_answer", **values)
+    error_text = response_templates.render("degraded_answer_error", **values)
+    assert "w wyznaczonym czasie" in deadline_text
+    assert "w wyznaczonym czasie" not in error_text
+    assert "a.docx" in error_text
@@ -0,0 +1,30 @@
+#imports
+from core.document_store import DocumentStore, make_doc_id
+
+
+def test_save_and_get_document(tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.db"))
+    doc_id = make_doc_id("/data/a.docx")
+    store.save_document({"doc_id": doc_id, "source_file": "/data/a.docx", "filename": "a.docx",
+                         "total_chunks": 3, "text": "pełny tekst"}, "knowledge_base")
+    stored = store.get_document(doc_id)
+    assert stored["total_chunks"] == 3
+    assert stored["text"] == "pełny tekst"
+    assert stored["collection"] == "knowledge_base"
+    assert store.count() == 1
+
+
+
+def test_replace_collection_prunes_deleted_files(tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.db"))
+    kept, deleted, other = (make_doc_id(f"/data/{name}") for name in ("kept.docx", "deleted.docx", "case.txt"))
+    store.save_document({"doc_id": kept, "source_file": "/data/kept.docx", "file_hash": "old"}, "knowledge_base")
+    store.save_document({"doc_id": deleted, "source_file": "/data/deleted.docx"}, "knowledge_base")
+    store.save_document({"doc_id": other, "source_file": "/data/case.txt"}, "special_cases")
+
+    removed = store.replace_collection("knowledge_base", [{"doc_id": kept, "source_file": "/data/kept.docx", "file_hash": "new"}])
+
+    assert removed == 1
+    assert store.get_document(deleted) is None
+    assert store.get_document(kept)["file_hash"] == "new"
+    assert store.get_document(other) is not None
@@ -0,0 +1,25 @@
+#imports
+import importlib
+import pytest
+
+# The service modules need the full runtime stack (Qdrant client, SentenceTransformer, NumPy, python-docx)
+for _dependency in ("numpy", "qdrant_client", "sentence_transformers", "docx", "fastapi", "requests"):
+    pytest.importorskip(_dependency)
+
+
+#test: every module that builds prompts or singletons at import time can be imported
+@pytest.mark.parametrize("module", [
+    "core.config",
+    "core.llm_service",
+    "core.document_generator",
+    "core.support_agent",
+    "api.api",
+])
+def test_module_imports(module):
+    importlib.import_module(module)
+
+
+#test: module-level prompts are plain text - no unresolved format fields left in them
+def test_classifier_prompt_keeps_json_example():
+    from core.support_agent import CLASSIFIER_SYSTEM_PROMPT
+    assert '{"category": "urlopy_zwolnienia"}' in CLASSIFIER_SYSTEM_PROMPT
@@ -0,0 +1,54 @@
+#imports
+import time
+
+import pytest
+
+from core.llm_cache import LLMResponseCache, make_cache_key
+
+
+def key(n):
+    return make_cache_key("llama3", f"prompt {n}", 0.1, 256)
+
+
+def test_sqlite_tier_keeps_most_recently_used(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    cache = LLMResponseCache(max_entries=1, sqlite_path=path, sqlite_max_entries=3)
+    cache.PRUNE_EVERY = 1
+    for n in range(3):
+        cache.put(key(n), f"answer {n}")
+    assert cache.get(key(0)) == "answer 0"  # touched - becomes most recent
+    cache.put(key(3), "answer 3")
+
+    reopened = LLMResponseCache(max_entries=1, sqlite_path=path, sqlite_max_entries=3)
+    assert reopened.get(key(1)) is None
+    assert [reopened.get(key(n)) for n in (0, 2, 3)] == ["answer 0", "answer 2", "answer 3"]
+
+
+def test_sqlite_entries_expire(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    LLMResponseCache(max_entries=1, sqlite_path=path, ttl_seconds=60).put(key(0), "answer 0")
+    assert LLMResponseCache(max_entries=1, sqlite_path=path, ttl_seconds=60).get(key(0)) == "answer 0"
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert LLMResponseCache(max_entries=1, sqlite_path=path, ttl_seconds=60).get(key(0)) is None
+
+
+def test_fallback_answer_cached_under_fallback_model():
+    pytest.importorskip("requests")
+    from core.llm_service import LLMService
+    from tests.test_ollama_pool import StubOllama
+
+    stub = StubOllama(fail_models={"small"})
+    try:
+        service = LLMService(model="llama3", base_urls=[stub.url], cache=LLMResponseCache(),
+                             tasks={"answer": {"model": "small"}})
+        first = service.generate_result("pytanie", task="answer", max_retries=2)
+        assert not first.error and first.model == "llama3"
+
+        # the retry tries the task model again instead of reporting the fallback's answer as its own
+        second = service.generate_result("pytanie", task="answer", max_retries=2)
+        assert not second.cached and second.model == "llama3"
+        assert service.cache.get(make_cache_key("llama3", "\x00pytanie\x00", 0.1, -1)) == first.text
+    finally:
+        stub.close()
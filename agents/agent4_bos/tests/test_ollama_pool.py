@@ -0,0 +1,139 @@
+#imports
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from core.ollama_pool import OllamaPool
+from core.llm_service import LLMService
+
+MODEL = "llama3"
+
+
+#class: StubOllama - minimal Ollama (/api/ps, /api/chat) in a background thread
+class StubOllama:
+    def __init__(self, loaded=(), fail=False, delay=0.0, fail_models=()):
+        self.loaded = list(loaded)
+        self.fail = fail
+        self.fail_models = set(fail_models)
+        self.delay = delay
+        self.chat_calls = 0
+        self.ps_calls = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/ps":
+                    stub.ps_calls += 1
+                    time.sleep(stub.delay)
+                    self._reply(200, {"models": [{"name": name} for name in stub.loaded]})
+                else:
+                    self._reply(404, {})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stub.chat_calls += 1
+                if stub.fail or body.get("model") in stub.fail_models:
+                    self._reply(500, {"error": "stub failure"})
+                else:
+                    self._reply(200, {"message": {"content": f"ok from {stub.url}"}})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stubs():
+    servers = [StubOllama(), StubOllama()]
+    yield servers
+    for server in servers:
+        server.close()
+
+
+def wait_for(condition, timeout=2.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_outstanding_requests_spread_over_endpoints(stubs):
+    pool = OllamaPool([s.url for s in stubs], ps_ttl=3600)
+    first = pool.acquire(MODEL)
+    second = pool.acquire(MODEL)
+    assert {first.url, second.url} == {s.url for s in stubs}
+
+
+def test_lower_latency_endpoint_preferred(stubs):
+    pool = OllamaPool([s.url for s in stubs], ps_ttl=3600)
+    fast, slow = pool.endpoints
+    pool.release(pool.acquire(MODEL, exclude={slow.url}), MODEL, latency_ms=100)
+    pool.release(pool.acquire(MODEL, exclude={fast.url}), MODEL, latency_ms=1000)
+    assert pool.acquire(MODEL) is fast
+
+
+def test_warmth_is_weighted_not_filtered(stubs):
+    pool = OllamaPool([s.url for s in stubs], ps_ttl=3600, cold_penalty=4)
+    warm, cold = pool.endpoints
+    warm.loaded_models.add(MODEL)
+    # an idle warm endpoint wins over an idle cold one
+    assert pool.acquire(MODEL) is warm
+    # ...but once enough requests pile up on it, the cold endpoint takes the next one
+    for _ in range(3):
+        pool.acquire(MODEL, exclude={cold.url})
+    assert pool.acquire(MODEL) is cold
+
+
+def test_loaded_models_refreshed_in_background(stubs):
+    stubs[0].loaded = [f"{MODEL}:latest"]
+    stubs[0].delay = stubs[1].delay = 0.5
+    pool = OllamaPool([s.url for s in stubs], ps_ttl=0.0)
+    start = time.perf_counter()
+    pool.acquire(MODEL)
+    # /api/ps is slow, but acquire does not wait for it
+    assert time.perf_counter() - start < 0.25
+    assert wait_for(lambda: MODEL in pool.endpoints[0].loaded_models)
+
+
+def test_failing_endpoint_ejected(stubs):
+    pool = OllamaPool([s.url for s in stubs], ps_ttl=3600, eject_after=2, eject_seconds=60)
+    bad, good = pool.endpoints
+    for _ in range(2):
+        pool.release(pool.acquire(MODEL, exclude={good.url}), MODEL, ok=False)
+    assert bad.ejected(time.time())
+    assert all(pool.acquire(MODEL) is good for _ in range(3))
+
+
+def test_failed_call_retried_on_other_endpoint(stubs):
+    broken, healthy = stubs
+    broken.fail = True
+    service = LLMService(model=MODEL, base_urls=[broken.url, healthy.url], tasks={"answer": {}})
+    # make the broken endpoint the first choice
+    service.pool.endpoints[0].loaded_models.add(MODEL)
+    service.pool.endpoints[0].loaded_checked = service.pool.endpoints[1].loaded_checked = time.time()
+    result = service.generate_result("pytanie", task="answer", max_retries=2)
+    assert not result.error
+    assert result.endpoint == healthy.url
+    assert broken.chat_calls == 1 and healthy.chat_calls == 1
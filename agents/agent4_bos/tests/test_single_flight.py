@@ -0,0 +1,73 @@
+#imports
+import asyncio
+
+import pytest
+
+from core.deadline import Deadline
+from core.single_flight import AsyncSingleFlight
+
+
+def test_followers_share_the_leaders_result():
+    async def scenario():
+        flight, calls = AsyncSingleFlight("test"), []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"answer": 42}
+
+        results = await asyncio.gather(*(flight.run("q", work) for _ in range(3)))
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"answer": 42}] * 3
+
+
+def test_cancelled_leader_makes_follower_retry():
+    async def scenario():
+        flight, calls = AsyncSingleFlight("test"), []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flight.run("q", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.run("q", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return calls, await follower
+
+    calls, result = asyncio.run(scenario())
+    assert result == "done"
+    assert len(calls) == 2
+
+
+def test_cancelled_follower_leaves_leader_running():
+    async def scenario():
+        flight = AsyncSingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flight.run("q", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.run("q", work))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_deadline_buckets_separate_short_and_long_budgets():
+    assert Deadline(1000).bucket() == 0
+    assert Deadline(45000).bucket() == Deadline(60000).bucket() == 5
+    assert Deadline(5000).bucket() != Deadline(60000).bucket()